@@ -14,3 +14,53 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+from django.core.urlresolvers import reverse
+from apps.core.models import Author, Git, Test, Arch, Distro, System
+from apps.core.models import JobTemplate, Job, Recipe, Task, FAIL, PASS
+from apps.waiver.models import Comment
+
+
+class ApiQueriesTest(TestCase):
+    """
+    Number of queries of the detail panel doesn't depend on number of tasks
+    """
+
+    def setUp(self):
+        owner = Author.objects.create(name="Owner", email="owner@example.com")
+        git = Git.objects.create(name="tests", localurl="http://example.com/",
+                                 url="example.com/tests.git")
+        template = JobTemplate.objects.create(whiteboard="Daily")
+        job = Job.objects.create(template=template, uid="J:1")
+        self.recipe = Recipe.objects.create(
+            job=job, uid="1", whiteboard="recipe",
+            system=System.objects.create(hostname="host"),
+            arch=Arch.objects.create(name="x86_64"),
+            distro=Distro.objects.create(name="RHEL-7"))
+        for ix in range(30):
+            test = Test.objects.create(name="/test/%s" % ix, owner=owner,
+                                       git=git)
+            task = Task.objects.create(uid="%s" % (ix + 1), test=test,
+                                       recipe=self.recipe,
+                                       result=FAIL if ix % 2 else PASS)
+            Comment.objects.create(task=task, recipe=self.recipe,
+                                   username="user", content="comment")
+
+    def test_recipe_info(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("api", args=["recipe-info"]),
+                                       {"recipe": "R:1"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_tasks(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("api", args=["recipe-tasks"]),
+                                       {"recipe": "R:1", "filter": "all"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_task_info(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("api", args=["task-info"]),
+                                       {"task": "T:2"})
+        self.assertEqual(response.status_code, 200)
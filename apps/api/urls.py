@@ -10,9 +10,10 @@ from django.conf import settings
 from django.contrib import admin
 from apps.core.views import *
 from apps.kerberos.views import *
+from apps.core.utils.generation import cache_by_generation
 admin.autodiscover()
 
 urlpatterns = patterns('',
-	url(r'^', 'apps.api.views.performance', name='performance'),
-    url(r'^(?P<action>[^/]+)$', ApiView.as_view(), name='api'),
+	url(r'^$', 'apps.api.views.performance', name='performance'),
+    url(r'^(?P<action>[^/]+)$', cache_by_generation(ApiView.as_view()), name='api'),
 )
\ No newline at end of file
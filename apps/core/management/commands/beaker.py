@@ -5,12 +5,12 @@
 # Email: mkorbel@redhat.com
 # Date: 20.07.2014
 
-import time
 import logging
 from texttable import Texttable
 from optparse import make_option
 from apps.core.models import JobTemplate, Job, Recipe
 from apps.core.utils.beaker import Beaker
+from apps.core.utils import rate_limit
 from apps.core.utils.advance_command import AdvancedCommand, make_option_group
 from apps.taskomatic.models import TaskPeriodSchedule
 from  datetime import datetime
@@ -302,14 +302,10 @@ class Command(AdvancedCommand):
             if fullInfo:
                 tags = ",".join([tag.name for tag in jobT.tags.all()])
                 table.add_row([str(job), jobT.whiteboard, tags])
-            if not simulate:
-                # Beaker guys told us we are causing too big load,
-                # so adding this sleep
-                # FIXME only temporary, rewrite code for scheduling to tttt
-                # taskomatic
-                time.sleep(4.5)
         if fullInfo:
             print table.draw()
+        if not simulate:
+            logger.info(rate_limit.limiter.summary())
 
     #--------------------------------------------------------------------------
     # RESCHEDULE
@@ -370,14 +366,10 @@ class Command(AdvancedCommand):
                                tags])
             else:
                 print str(jobN)
-            if not simulate:
-                # Beaker guys told us we are causing too big load,
-                # so adding this sleep
-                # FIXME only temporary, rewrite code for scheduling to tttt
-                # taskomatic
-                time.sleep(4.5)
         if fullInfo:
             print table.draw()
+        if not simulate:
+            logger.info(rate_limit.limiter.summary())
 
     #--------------------------------------------------------------------------
     # RETURN2BEAKER
@@ -503,11 +495,7 @@ class Command(AdvancedCommand):
                 tags = ",".join([tag.name for tag in job.template.tags.all()])
                 table.add_row([str(res), job.uid, job.template.whiteboard,
                                tags])
-            if not simulate:
-                # Beaker guys told us we are causing too big load,
-                # so adding this sleep
-                # FIXME only temporary, rewrite code for scheduling to tttt
-                # taskomatic
-                time.sleep(4.5)
         if fullInfo:
             print table.draw()
+        if not simulate:
+            logger.info(rate_limit.limiter.summary())
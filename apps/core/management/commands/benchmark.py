@@ -0,0 +1,163 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import shutil
+import resource
+import tempfile
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings
+from apps.core.models import Recipe
+from apps.core.utils import rate_limit, beaker_client
+from apps.core.utils.beaker import Beaker
+from apps.core.utils.beaker_stub import BeakerStub
+from apps.core.management.commands.check import init
+
+JOB_XML = ("<job><whiteboard>benchmark</whiteboard><recipeSet><recipe>"
+           "<task name=\"/distribution/install\"/></recipe></recipeSet>"
+           "</job>")
+
+
+class Command(BaseCommand):
+    help = ("Measure synchronization of jobs (check) against a fake Beaker "
+            "server in a temporary test database")
+    requires_model_validation = True
+    can_import_settings = True
+
+    option_list = BaseCommand.option_list + (
+        make_option('--jobs',
+            dest='jobs',
+            type='int',
+            default=100,
+            help='number of jobs in fake beaker (default 100)'),
+        make_option('--recipes',
+            dest='recipes',
+            type='int',
+            default=2,
+            help='recipes per job (default 2)'),
+        make_option('--tasks',
+            dest='tasks',
+            type='int',
+            default=10,
+            help='tasks per recipe (default 10)'),
+        make_option('--guests',
+            dest='guests',
+            type='int',
+            default=0,
+            help='guest recipes per recipe (default 0)'),
+        make_option('--latency',
+            dest='latency',
+            type='float',
+            default=0.0,
+            help='latency of every call of fake beaker in seconds'),
+        make_option('--workers',
+            dest='workers',
+            type='int',
+            default=settings.CHECK_WORKERS,
+            help='number of parallel connections to beaker (default %s)'
+                 % settings.CHECK_WORKERS),
+        make_option('--passes',
+            dest='passes',
+            type='int',
+            default=2,
+            help='number of syncs, the next ones find unchanged jobs '
+                 '(default 2)'),
+        make_option('--actions',
+            dest='actions',
+            type='int',
+            default=100,
+            help='number of submitted jobs and returned recipes '
+                 '(default 100)'),
+        make_option('--rate',
+            dest='rate',
+            type='float',
+            default=1000.0,
+            help='rate limit of submits and returns per second '
+                 '(default 1000, BEAKER_RATE is %s)' % settings.BEAKER_RATE),
+        )
+
+    def handle(self, *args, **kwargs):
+        stub = BeakerStub(("127.0.0.1", 0), jobs=kwargs["jobs"],
+                          recipes=kwargs["recipes"], tasks=kwargs["tasks"],
+                          guests=kwargs["guests"],
+                          latency=kwargs["latency"])
+        stub.start()
+        # synthetic jobs are never saved to the real database
+        try:
+            from south.management.commands import patch_for_test_db_setup
+            patch_for_test_db_setup()
+        except ImportError:
+            pass
+        old_name = settings.DATABASES["default"]["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        tmp = tempfile.mkdtemp(prefix="benchmark-")
+        # the benchmark doesn't share the limiter with running commands
+        limiter = rate_limit.limiter
+        rate_limit.limiter = rate_limit.TokenBucket(
+            path=os.path.join(tmp, "rate"), rate=kwargs["rate"],
+            burst=kwargs["rate"])
+        try:
+            with override_settings(BEAKER_SERVER=stub.url,
+                                   BEAKER_OWNER="benchmark",
+                                   BEAKER_PASS="benchmark",
+                                   DATA_GENERATION_FILE=os.path.join(
+                                       tmp, "generation")):
+                for it in range(max(kwargs["passes"], 1)):
+                    self.sync(it + 1, kwargs)
+                self.submit(kwargs["actions"])
+                self.return2beaker(kwargs["actions"])
+        finally:
+            beaker_client.close_client()
+            rate_limit.limiter = limiter
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(tmp)
+            stub.shutdown()
+            stub.server_close()
+
+    def sync(self, number, kwargs):
+        connection.use_debug_cursor = True
+        connection.queries = []
+        t1 = time.time()
+        stat = init(init=True, running=False, minid=None, date=None,
+                    quiet=True, workers=kwargs["workers"], jobs=None)
+        duration = time.time() - t1
+        queries = len(connection.queries)
+        connection.use_debug_cursor = None
+        connection.queries = []
+
+        jobs = kwargs["jobs"]
+        # ru_maxrss is in kilobytes on Linux
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        print("pass %d: %d jobs (%d recipes, %d tasks per recipe, %d guests)"
+              " in %.2f s" % (number, jobs, kwargs["recipes"],
+                              kwargs["tasks"], kwargs["guests"], duration))
+        print("  %.2f jobs/sec, %.1f queries/job, peak RSS %.1f MB"
+              % (jobs / duration if duration > 0 else 0,
+                 float(queries) / jobs if jobs else 0, rss))
+        print("  %d skipped, %d updated, %d finished, %d errors"
+              % (stat["skipped"], stat["updated"], stat["finished"],
+                 stat["error"]))
+
+    def actions(self, title, method, args):
+        beaker = Beaker()
+        t1 = time.time()
+        for it in args:
+            beaker.request(method, *it)
+        duration = time.time() - t1
+        print("%s: %d requests in %.2f s, %.2f requests/sec"
+              % (title, len(args), duration,
+                 len(args) / duration if duration > 0 else 0))
+
+    def submit(self, number):
+        self.actions("submit", "job_submit", [(JOB_XML, )] * number)
+
+    def return2beaker(self, number):
+        uids = list(Recipe.objects.order_by("uid")
+                          .values_list("uid", flat=True)[:number])
+        self.actions("return2beaker", "extend_reservation",
+                     [(int(it), 0) for it in uids])
+        print("  %s" % rate_limit.limiter.summary())
@@ -12,14 +12,19 @@ from django.conf import settings
 from apps.core.models import *
 from apps.core.utils.beaker import *
 from apps.core.utils.date_helpers import currentDate
-import xmlrpclib
+from apps.core.utils import lookup_cache, generation, beaker_client
 import os, sys
 import re
-import xml.dom.minidom
+import hashlib
+import logging
+import threading
+import Queue
 from datetime import datetime, timedelta
 import time
 from optparse import make_option
 
+logger = logging.getLogger('commands')
+
 class Command(BaseCommand):
     help = ("Load data from beaker and save to db")
     requires_model_validation = True
@@ -50,28 +55,137 @@ class Command(BaseCommand):
         make_option('--default-date',
             dest='date',
             help='Set default date when job was started'),
+        make_option('--workers',
+            dest='workers',
+            type='int',
+            default=settings.CHECK_WORKERS,
+            help='number of parallel connections to beaker (default %s)'
+                 % settings.CHECK_WORKERS),
+        make_option('--rebuild-matrix',
+            action='store_true',
+            dest='rebuild_matrix',
+            default=False,
+            help='recompute precomputed matrices of the jobs and tests pages from db'),
+        make_option('--template',
+            dest='template',
+            type='int',
+            default=None,
+            help='rebuild matrices only for the job template (id)'),
         )
 
     def handle(self, *args, **kwargs):
         # print "args:", kwargs
+        if kwargs.get("rebuild_matrix"):
+            template = None
+            if kwargs.get("template"):
+                template = JobTemplate.objects.get(id=kwargs["template"])
+            RecipeMatrix.rebuild(template)
+            TestMatrix.rebuild(template)
+            generation.bump()
+            return
         init(*args, **kwargs)
 
 
-def init(*args, **kwargs):
-    progress = CheckProgress()
-    if settings.BEAKER_SERVER.startswith("http"):
-        client = xmlrpclib.Server("%s/RPC2" % settings.BEAKER_SERVER, verbose=0)
+class JobFetcher(threading.Thread):
+    """
+        Worker which downloads informations about jobs from beaker.
+
+        Each worker uses its own Beaker client (xmlrpclib is not
+        thread safe) and it doesn't touch DB, the results are passed to
+        the DB writer through the queue.
+    """
+
+    def __init__(self, jobs, results, finished, running):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.jobs = jobs
+        self.results = results
+        self.finished = finished
+        self.running = running
+
+    def run(self):
+        client = beaker_client.get_client()
+        try:
+            while True:
+                try:
+                    uid = self.jobs.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    data = client.task_info(uid)
+                    content = None
+                    # download xml only when the job is not finished in db
+                    # or it is still running in beaker (--running)
+                    if (self.running and not data["is_finished"]) or \
+                       uid not in self.finished:
+                        content = client.to_xml(uid)
+                    self.results.put((uid, data, content, None))
+                except Exception as e:
+                    self.results.put((uid, None, None, e))
+        finally:
+            client.close()
+
+
+def save_job(uid, data, content, cfg_date=None):
+    """
+        Save informations about job, which were downloaded from beaker.
+        Return "skipped" (nothing changed since last check), "updated"
+        or "finished".
+    """
+    # workaround for test which set label with actial date
+    labeldates = re.findall(r"^([0-9]{4}-[0-9]{2}-[0-9]{2})", data["method"])
+    if labeldates:
+        label = data["method"][11:]
+        # if not cfg_date:
+        #    cfg_date = datetime.strptime(labeldates[0],"%Y-%m-%d")
     else:
-        client = xmlrpclib.Server("https://%s/RPC2" % settings.BEAKER_SERVER, verbose=0)
+        label = data["method"]
+    jt, status = JobTemplate.objects.get_or_create(whiteboard=label)
+    if status: jt.save()
 
-    # key = client.auth.login_password(USER, PASS)
-    # key = client.auth.login_krb(USER, PASS)
+    defaults = {"template": jt}
+    if cfg_date: defaults["date"] = cfg_date
+    job, status = Job.objects.get_or_create(uid=uid, defaults=defaults)
+    is_running = not data["is_finished"]
+
+    fingerprint = None
+    if content:
+        if isinstance(content, unicode):
+            fingerprint = hashlib.sha1(content.encode("utf-8")).hexdigest()
+        else:
+            fingerprint = hashlib.sha1(content).hexdigest()
+    # the job is same as in last check, skip it without writing to db
+    if not status and job.template_id == jt.id and \
+       job.is_running == is_running and (is_running or job.is_finished) and \
+       (not content or job.fingerprint == fingerprint):
+        return "skipped"
+
+    job.template = jt
+    job.is_running = is_running
+    if content and job.fingerprint != fingerprint:
+        parse_job(job, iter_recipes(content))
+        job.fingerprint = fingerprint
+
+    result = "updated"
+    if not job.is_running:
+        if not job.is_finished:
+            result = "finished"
+        job.is_finished = True
+    job.save()
+    return result
+
+
+def init(*args, **kwargs):
+    progress = CheckProgress()
+    # names of archs, distros, systems and tests are resolved from memory
+    lookup_cache.warm_all()
 
     cfg_running = kwargs["running"]
     cfg_init = kwargs["init"]
     cfg_minid = kwargs["minid"]
     cfg_date = kwargs["date"]
     cfg_quiet = kwargs["quiet"]
+    cfg_workers = max(int(kwargs.get("workers") or settings.CHECK_WORKERS), 1)
     if kwargs["jobs"]:
         cfg_jobs = kwargs["jobs"].split(" ")
     else:
@@ -92,45 +206,62 @@ def init(*args, **kwargs):
     if cfg_jobs:
         jobslist = cfg_jobs
     elif cfg_init:
-        jobslist = client.jobs.filter(bkr_filter)
+        client = beaker_client.get_client()
+        try:
+            jobslist = client.jobs_filter(bkr_filter)
+        finally:
+            # the workers use own clients, the connection is not kept
+            client.close()
     else:
         jobslist = [it["uid"] for it in Job.objects.values("uid").filter(is_finished=False)]
 
     progress.totalsum = len(jobslist)
-    progress.save()
+    progress.flush()
 
+    # uids of jobs which are finished in db, workers don't need to download
+    # xml for them (one query instead of one per job)
+    finished = set(Job.objects.filter(uid__in=jobslist, is_finished=True)
+                              .values_list("uid", flat=True))
+    jobs = Queue.Queue()
     for it in jobslist:
+        jobs.put(it)
+    # bounded queue - workers wait for the DB writer and don't keep
+    # too many downloaded xmls in memory
+    results = Queue.Queue(maxsize=cfg_workers * 2)
+    workers = [JobFetcher(jobs, results, finished, cfg_running)
+               for it in range(min(cfg_workers, len(jobslist)))]
+    t1 = time.time()
+    for worker in workers:
+        worker.start()
+
+    # DB writer - all writes are serialized in this thread
+    stat = {"skipped": 0, "updated": 0, "finished": 0, "error": 0}
+    for ix in range(len(jobslist)):
+        uid, data, content, error = results.get()
         if not cfg_quiet:
-            print("%d/%d (%s)" % (progress.actual, progress.totalsum, it))
-
-        data = client.taskactions.task_info(it)
-        # workaround for test which set label with actial date
-        labeldates = re.findall(r"^([0-9]{4}-[0-9]{2}-[0-9]{2})", data["method"])
-        if labeldates:
-            label = data["method"][11:]
-            # if not cfg_date:
-            #    cfg_date = datetime.strptime(labeldates[0],"%Y-%m-%d")
+            print("%d/%d (%s)" % (progress.actual, progress.totalsum, uid))
+        if error:
+            logger.error("Problem with downloading of the job %s: %s"
+                         % (uid, error))
+            stat["error"] += 1
         else:
-            label = data["method"]
-        jt, status = JobTemplate.objects.get_or_create(whiteboard=label)
-        if status: jt.save()
-
-        defaults = {"template": jt}
-        if cfg_date: defaults["date"] = cfg_date
-        job, status = Job.objects.get_or_create(uid=it, defaults=defaults)
-        job.template = jt
-        job.is_running = not data["is_finished"]
-
-        if ((cfg_running and job.is_running) or not job.is_finished):
-            content = client.taskactions.to_xml(it)
-            dom = xml.dom.minidom.parseString(content)
-
-            for recipexml in dom.getElementsByTagName("recipe"):
-                parse_recipe(recipexml, job)
-
-        if not job.is_running:
-             job.is_finished = True
-        job.save()
+            result = save_job(uid, data, content, cfg_date)
+            if result != "skipped":
+                # cached pages and api responses are obsolete
+                generation.bump()
+            stat[result] += 1
         progress.counter()
+    for worker in workers:
+        worker.join()
     progress.finished()
 
+    duration = time.time() - t1
+    speed = len(jobslist) / duration if duration > 0 else 0
+    msg = ("%d jobs were checked in %.1f s (%.2f jobs/sec, %d workers): "
+           "%d skipped, %d updated, %d finished, %d errors"
+           % (len(jobslist), duration, speed, len(workers), stat["skipped"],
+              stat["updated"], stat["finished"], stat["error"]))
+    logger.info(msg)
+    if not cfg_quiet:
+        print(msg)
+    return stat
@@ -9,20 +9,55 @@
 # Email: mkorbel@redhat.com
 # Date: 20.07.2014
 
+import os
+import time
 import logging
+import traceback
+import multiprocessing
+from optparse import make_option
 from django.core.management.base import BaseCommand
-from apps.core.models import Git
+from django.db import connection
+from apps.core.models import Git, Test
+from apps.core.utils import generation, lookup_cache
 from django.conf import settings
 
 logger = logging.getLogger('commands')
 
 
+def fetch_repo(args):
+    """
+        Refresh the repository and collect informations about tests and
+        their history. It runs in worker process and doesn't touch DB.
+    """
+    path, folders, since = args
+    t1 = time.time()
+    git = Git(name=os.path.basename(path))
+    git.path_absolute = path
+    git.log = logger
+    try:
+        git.refresh()
+        head = git.getHead()
+        infos = git.collectInformationsAboutTests(since)
+        folders = set(folders) | set([folder for folder, info in infos])
+        history = git.collectHistory(folders)
+    except Exception:
+        return path, None, None, None, time.time() - t1, traceback.format_exc()
+    return path, head, infos, history, time.time() - t1, None
+
+
 class Command(BaseCommand):
     # This is optional attribute, if we want to change default command name
     # for Taskomatic.
     COMMAND_NAME = "checkrepo"
 
     args = '[reponame ...]'
+    option_list = BaseCommand.option_list + (
+        make_option('--full',
+            action='store_true',
+            dest='full',
+            default=False,
+            help='parse all Makefiles, not only changed since last check'),
+        )
     help = ("Load/refresh data from gits.")
     requires_model_validation = True
     can_import_settings = True
@@ -32,21 +67,54 @@ class Command(BaseCommand):
         for arg in args:
             if arg.strip():
                 repos.append(arg)
+        gits = dict()
         for path in settings.REPOSITORIES_GIT:
             for repo in settings.REPOSITORIES_GIT[path]:
                 if len(repos) > 0 and repo not in repos:
                     continue
                 git = Git.getGitFromFolder("%s%s" % (path, repo))
-                git.log = logger
                 if git:
-                    try:
-                        logger.info("Checking GIT %s" % repo)
-                        git.refresh()
-                        git.updateInformationsAboutTests()
-                        git.checkHistory()
-                    except Exception:
-                        logger.exception("Problem with git %s" % repo)
+                    git.log = logger
+                    gits[git.path_absolute] = git
                 else:
                     logger.error("Problem with refresh git %s%s" %
                                  (path, repo))
-
+        # git commands run in parallel, this process is the only one which
+        # writes to DB
+        params = [(path, list(Test.objects.filter(git=git)
+                                  .exclude(folder__isnull=True)
+                                  .exclude(folder="")
+                                  .values_list("folder", flat=True)),
+                   None if kwargs.get("full") else git.last_commit)
+                  for path, git in gits.items()]
+        # names of tests and emails of authors are resolved from memory
+        lookup_cache.tests.warm()
+        lookup_cache.authors.warm()
+        connection.close()
+        pool = multiprocessing.Pool(max(min(settings.CHECKREPO_WORKERS,
+                                            len(params)), 1))
+        try:
+            for path, head, infos, history, duration, error in \
+                    pool.imap_unordered(fetch_repo, params):
+                git = gits[path]
+                if error:
+                    logger.error("Problem with git %s: %s" % (git.name, error))
+                    continue
+                t1 = time.time()
+                try:
+                    logger.info("Checking GIT %s" % git.name)
+                    git.saveInformationsAboutTests(infos)
+                    git.saveHistory(history)
+                    git.last_commit = head
+                    git.save()
+                except Exception:
+                    logger.exception("Problem with git %s" % git.name)
+                    continue
+                logger.info("GIT %s: %d tests, git %.1f s, db %.1f s" %
+                            (git.name, len(infos), duration,
+                             time.time() - t1))
+        finally:
+            pool.close()
+            pool.join()
+        # history of tests is shown on cached pages
+        generation.bump()
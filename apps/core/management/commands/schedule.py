@@ -9,12 +9,12 @@
 # Email: mkorbel@redhat.com
 # Date: 20.07.2014
 
-import time
 import logging
 from optparse import make_option
 from django.core.management.base import BaseCommand
 from apps.core.models import JobTemplate
 from apps.core.utils.beaker import Beaker
+from apps.core.utils import rate_limit
 from apps.taskomatic.models import TaskPeriodSchedule
 
 logger = logging.getLogger('commands')
@@ -67,11 +67,7 @@ class Command(BaseCommand):
                     logger.error("This JobTemplate (%s) does not exist." % it)
                     continue
                 bk.jobSchedule(jobTs[0])
-                # Beaker guys told us we are causing too big load,
-                # so adding this sleep
-                # FIXME only temporary, rewrite code for scheduling to tttt
-                # taskomatic
-                time.sleep(4.5)
+            logger.info(rate_limit.limiter.summary())
         if "files" in kwargs and kwargs["files"]:
             cfg_files = kwargs["files"].split()
             if len(cfg_files) == 0:
@@ -102,11 +98,7 @@ class Command(BaseCommand):
             logger.info("%s JobTemplates are prepared." % len(jobTs))
             for jobT in jobTs:
                 bk.jobSchedule(jobT)
-                # Beaker guys told us we are causing too big load,
-                # so adding this sleep
-                # FIXME only temporary, rewrite code for scheduling to tttt
-                # taskomatic
-                time.sleep(45)
+                logger.info(rate_limit.limiter.summary())
                 return
 #        if cfg_tpl:
 #            for it in cfg_tpl:
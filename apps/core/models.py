@@ -10,18 +10,28 @@ import os
 import sys
 import re
 import git
+import time
+import json
 import logging
 import gitconfig
 from django.db import models
-from datetime import datetime
+from datetime import datetime, timedelta
 from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Count
+from django.utils.timezone import utc
+from django.utils.safestring import mark_safe
 from django.core.urlresolvers import reverse
-from apps.core.utils.date_helpers import toUTC, currentDate, TZDateTimeField
+from apps.core.utils.date_helpers import toUTC, currentDate, TZDateTimeField, force_tz
+from apps.core.utils.labels import render_lable
+from apps.core.utils import bulk
+# cached pages are invalidated by signals of saved models
+from apps.core.utils import generation
 from taggit.managers import TaggableManager
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from apps.taskomatic.models import TaskPeriodSchedule
+from apps.taskomatic.models import Task as TaskomaticTask
 
 logger = logging.getLogger(__name__)
 
@@ -105,6 +115,8 @@ class Git(models.Model):
     name = models.CharField(max_length=64, blank=True, null=True)
     localurl = models.CharField(max_length=255)
     url = models.CharField(max_length=255, unique=True)
+    # the last commit, which Makefiles were processed
+    last_commit = models.CharField(max_length=40, blank=True, null=True)
     path_absolute = None
     cmd = None
     log = None
@@ -160,20 +172,70 @@ class Git(models.Model):
         """
           Update informations about tests from Makefiles.
         """
+        self.saveInformationsAboutTests(self.collectInformationsAboutTests())
+
+    def getHead(self):
+        return self.__getGitCmd().rev_parse('HEAD').strip()
+
+    def collectInformationsAboutTests(self, since=None):
+        """
+          Parse Makefiles of tests, return list of (folder, info).
+          If the commit `since` is set, only Makefiles changed after this
+          commit are parsed. It doesn't touch DB, so it can run in other
+          process.
+        """
         git = self.__getGitCmd()
-        # git ls-files --full-name *Makefile
-        mkFiles = git.ls_files('--full-name', '*Makefile')
-        for mkFile in mkFiles.splitlines():
+        mkFiles = None
+        if since:
+            try:
+                # git diff --name-only <since>..HEAD
+                mkFiles = [it for it in git.diff('--name-only',
+                                                 '%s..HEAD' % since)
+                           .splitlines() if it.endswith('Makefile') and
+                           os.path.exists("%s/%s" % (self.path_absolute, it))]
+            except Exception:
+                self.__getLog().warning("The commit %s is unknown in '%s', "
+                                        "all Makefiles are parsed" %
+                                        (since, self.name))
+        if mkFiles is None:
+            # git ls-files --full-name *Makefile
+            mkFiles = git.ls_files('--full-name', '*Makefile').splitlines()
+        tests = list()
+        for mkFile in mkFiles:
             folder = os.path.dirname(mkFile)
             info = self.__parseMakefile("%s/%s" % (self.path_absolute, mkFile))
             if 'Name' not in info:
                 self.__getLog().warning("The test '%s' doesn't contain"
                                         " Name in Makefile" % folder)
                 continue
-            owner = Author.parseAuthor(info.get('Owner'))
+            tests.append((folder, info))
+        return tests
+
+    def saveInformationsAboutTests(self, infos):
+        """
+          Save informations about tests from collectInformationsAboutTests.
+        """
+        from apps.core.utils import lookup_cache
+        # tests of the repository by folder (one query), the other tests
+        # are found or created by name through the lookup cache
+        folders = dict()
+        for test in Test.objects.filter(git=self).exclude(folder__isnull=True)\
+                                .order_by('id'):
+            folders.setdefault(test.folder, list()).append(test)
+        ids = lookup_cache.tests.get_ids(
+            [re.sub('\s+.*', '', info.get('Name')) for folder, info in infos
+             if folder not in folders], defaults={"git": self})
+        byname = Test.objects.in_bulk(ids.values()) if ids else dict()
+        owners = dict()
+        requires = list()
+        for folder, info in infos:
+            row = info.get('Owner')
+            if row not in owners:
+                owners[row] = Author.parseAuthor(row)
+            owner = owners[row]
             name = re.sub('\s+.*', '', info.get('Name'))
             test = None
-            tests = Test.objects.filter(folder=folder, git=self).order_by('id')
+            tests = folders.get(folder, list())
             if len(tests) > 0:
                 test = tests[0]
                 test.name = name
@@ -196,8 +258,7 @@ class Git(models.Model):
                             it3.save()
                         it.delete()
             else:
-                test, status = Test.objects.get_or_create(name=name, defaults={
-                                                          "git": self})
+                test = byname[ids[name]]
             test.owner = owner
             test.folder = folder
             if 'Description' in info and \
@@ -209,34 +270,64 @@ class Git(models.Model):
                 test.type = info.get('Type')
             if 'RunFor' in info:
                 self.__updateGroups(test, info.get('RunFor'))
-            self.__updateDependences(test, info.get('RhtsRequires'))
             test.save()
+            requires.append((test, info.get('RhtsRequires')))
+        self.__updateDependences(requires)
 
     def checkHistory(self):
         """
           Check history of known tests
         """
+        folders = Test.objects.filter(git=self).exclude(folder__isnull=True)\
+                              .exclude(folder="")\
+                              .values_list("folder", flat=True)
+        self.saveHistory(self.collectHistory(folders))
+
+    def collectHistory(self, folders):
+        """
+          Return the newest commit of every test folder changed in last
+          CHECK_COMMMITS_PREVIOUS_DAYS (folder -> rows of git log). It runs
+          only one git log for whole repository and it doesn't touch DB.
+        """
         git = self.__getGitCmd()
-        # git log --decorate=full --since=1 --simplify-by-decoration /
-        #         --pretty=%H|%aN|%ae|%ai|%d --follow HEAD
+        # git log --decorate=full --since=1 --name-only /
+        #         --pretty=format:%x00%H|%aN|%ae|%ai|%d HEAD
         checkDays = int(settings.CHECK_COMMMITS_PREVIOUS_DAYS)
         if not checkDays:
             checkDays = 1
-        tests = Test.objects.filter(git=self).only('folder')
+        folders = set(folders)
+        history = dict()
+        output = git.log('--decorate=full',
+                         '--since=%s.days' % checkDays,
+                         '--name-only',
+                         '--pretty=format:%x00%H|%aN|%ae|%ai|%d',
+                         'HEAD')
+        # commits are from the newest one
+        for commit in output.split('\x00'):
+            rows = commit.strip().split('\n')
+            if not rows[0]:
+                continue
+            for path in rows[1:]:
+                # the nearest parent folder of the path, which is a test
+                folder = os.path.dirname(path.strip())
+                while folder and folder not in folders:
+                    folder = os.path.dirname(folder)
+                if folder and folder not in history:
+                    history[folder] = [rows[0]]
+        return history
+
+    def saveHistory(self, history):
+        """
+          Save commits from collectHistory to history of tests
+        """
+        tests = Test.objects.filter(git=self).only('name', 'folder')
         for test in tests:
             if not test.folder:
                 self.__getLog().warning("The GIT folder for test '%s'"
                                         " is not declared." % test.name)
                 continue
-            rows = git.log('--decorate=full',
-                           '--since=%s.days' % checkDays,
-                           '--simplify-by-decoration',
-                           '--pretty=%H|%aN|%ae|%ai|%d',
-                           '--follow',
-                           'HEAD',
-                           "%s/%s" % (self.path_absolute, test.folder))\
-                      .split('\n')
-            self.__saveCommits(test, rows)
+            if test.folder in history:
+                self.__saveCommits(test, history[test.folder])
 
     def __getGitCmd(self):
         if not self.path_absolute:
@@ -310,34 +401,72 @@ class Git(models.Model):
                 test.groups.add(group)
 
 
-    def __updateDependences(self, test, rows):
-        if not rows:
-            rows = list()
-        dependencies = list()
-        for row in rows:
-            depName = re.sub(r'(test\(|\))', '', row).strip()
-            depTest = Test.objects.filter(name__endswith=depName).only('name',
-                                                                       'git')
-            if len(depTest) > 0 and depTest[0] not in dependencies:
-                dependencies.append(depTest[0])
-        dep_old = list(test.dependencies.all())
-        # Adding new dependencies
-        for dep in dependencies:
-            if dep == test:
-                continue
-            if dep in dep_old:
-                dep_old.remove(dep)
-            else:
-                test.dependencies.add(dep)
+    def __getSuffixMap(self):
+        """
+            Map of test names and all their suffixes (by path components)
+            to id of test. More tests with the same suffix - the first test
+            by name wins (as Test.objects.filter(name__endswith=..)[0]).
+        """
+        names = dict()
+        for test_id, name in Test.objects.order_by("-name")\
+                                         .values_list("id", "name"):
+            parts = name.split('/')
+            for ix in range(len(parts)):
+                suffix = '/'.join(parts[ix:])
+                names[suffix] = test_id
+                names['/' + suffix] = test_id
+        return names
+
+    def __updateDependences(self, requires):
+        """
+            Set dependencies of tests, requires is list of (test, rows of
+            RhtsRequires). Dependencies are resolved from memory and
+            changes are saved by one insert and one delete.
+        """
+        names = self.__getSuffixMap()
+        dependencies = dict()
+        for test, rows in requires:
+            if not rows:
+                rows = list()
+            elif not isinstance(rows, list):
+                rows = [rows, ]
+            deps = set()
+            for row in rows:
+                depName = re.sub(r'(test\(|\))', '', row).strip()
+                if depName and depName not in names:
+                    # suffix isn't made of whole path components (rare)
+                    ids = list(Test.objects.filter(name__endswith=depName)
+                               .order_by("name")
+                               .values_list("id", flat=True)[:1])
+                    names[depName] = ids[0] if ids else None
+                if names.get(depName) and names[depName] != test.id:
+                    deps.add(names[depName])
+            dependencies[test.id] = deps
+        if not dependencies:
+            return
+        through = Test.dependencies.through
+        old = dict()
+        for rel_id, from_id, to_id in through.objects\
+                .filter(from_test__in=dependencies.keys())\
+                .values_list("id", "from_test", "to_test"):
+            old[(from_id, to_id)] = rel_id
+        new = set([(from_id, to_id) for from_id, deps in dependencies.items()
+                   for to_id in deps])
         # Removing old/unsupported dependencies
-        for dep in dep_old:
-            test.dependencies.remove(dep)
+        removed = [rel_id for key, rel_id in old.items() if key not in new]
+        if removed:
+            through.objects.filter(id__in=removed).delete()
+        # Adding new dependencies
+        through.objects.bulk_create([
+            through(from_test_id=from_id, to_test_id=to_id)
+            for from_id, to_id in new if (from_id, to_id) not in old])
 
     def __saveCommits(self, test, rows):
         # 1731d5af22c22469fa7b181d1e33cd52731619a0|Jiri Mikulka|
         # jmikulka@redhat.com|2013-01-31 17:45:06 +0100|
         # (tag: RHN-Satellite-CoreOS-RHN-Satellite-Other-Sanity-spacewalk-
         #   create-channel-1_0-2)
+        from apps.core.utils import lookup_cache
         testName = test.name
         if testName.startswith('/'):
             testName = testName[1:]
@@ -352,9 +481,8 @@ class Git(models.Model):
                                 tag)
                 if res:
                     data['version'] = res.group(1)
-            author, status = Author.objects\
-                  .get_or_create(email=email, defaults={"name": name})
-            data['author'] = author
+            data['author_id'] = lookup_cache.authors.get_id(
+                email, defaults={"name": name})
             data['date'] = toUTC(date)
             commit, status = TestHistory.objects\
                   .get_or_create(commit=chash, test=test, defaults=data)
@@ -447,6 +575,8 @@ class Test(models.Model):
     folder = models.CharField(max_length=256, blank=True, null=True)
     is_enable= models.BooleanField("enable", default=True)
     groups = models.ManyToManyField(GroupOwner, blank=True)
+    # number of tasks of the test, it is updated during import from beaker
+    task_count = models.IntegerField(default=0, db_index=True)
 
     class Meta:
         ordering = ["name", ]
@@ -560,7 +690,18 @@ class JobTemplate(models.Model):
                 # First row
                 self.position = 0
 
-        return super(JobTemplate, self).save(*args, **kwargs)
+        # labels of precomputed matrix depend on grouprecipes, the matrix
+        # is recomputed by taskomatic (it takes long time)
+        rebuild = self.id and model.objects.filter(id=self.id)\
+                      .exclude(grouprecipes=self.grouprecipes).exists()
+        res = super(JobTemplate, self).save(*args, **kwargs)
+        if rebuild:
+            TaskomaticTask.objects.create(
+                title="Rebuild matrix: %s" % self.whiteboard,
+                common="check",
+                common_params="--rebuild-matrix --template=%d" % self.id,
+                status=TaskomaticTask.STATUS_ENUM_WAIT)
+        return res
 
     class Meta:
         ordering = ('period', 'position',)
@@ -647,24 +788,27 @@ class RecipeTemplate(models.Model, ObjParams):
     # TODO: Remove Arch rotation
     # This solution of rotation of Arch is not good idea.
     # Better idea is TasksList.
-    def getArchsForToday(self):
+    def getArchsForToday(self, archs=None, arch_map=None):
         """
-            Return list of architecures for today
+            Return list of architecures for today, archs of recipe and
+            map of Arch by name can be preloaded (see JobGen.load)
         """
 
         # Weekday as a decimal number [0(Sunday),6].
         weekday = int(datetime.now().strftime("%w"))
-        archs = [it.name for it in self.arch.all()]
         schedule = self.__parse_schedule_period(self.schedule)
 
         res = list()
         for it in schedule:
             if ((it[2] == weekday and it[1]) or \
                 (it[2] != weekday and not it[1])):
-                res.append(Arch.objects.get(name=it[0]))
+                arch = (arch_map or {}).get(it[0])
+                res.append(arch or Arch.objects.get(name=it[0]))
         if res: return res
 
         # if empty return all archs
+        if archs is not None:
+            return archs
         return self.get_arch()
 
 
@@ -803,6 +947,8 @@ class Job(models.Model):
     is_running = models.BooleanField(default=False)
     is_finished = models.BooleanField(default=False)  # this is for checking (no used for data from beaker)
     schedule = models.ForeignKey(TaskPeriodSchedule, null=True, blank=True)
+    # sha1 of the last xml from beaker, which was saved to db
+    fingerprint = models.CharField(max_length=40, blank=True, null=True)
 
     def __unicode__(self):
         return self.uid
@@ -906,43 +1052,50 @@ class Recipe(models.Model):
         self.statusbyuser = WAIVED
         self.save()
 
-    def recount_result(self):
-        result = Task.objects.values('result', "statusbyuser").filter(recipe=self).annotate(Count('result')).order_by("uid")
+    def recount_result(self, tasks=None):
+        """
+            Recount result, resultrate and waiver state of the recipe.
+            The tasks are tuples (result, statusbyuser, test name) ordered
+            by uid, if they are not set, they are loaded from DB by one
+            query. The recipe is not saved.
+        """
+        if tasks is None:
+            tasks = Task.objects.filter(recipe=self).order_by("uid")\
+                        .values_list("result", "statusbyuser", "test__name")
         total, total_ok, waived = 0, 0, False
         running = None
-        failed_test = []
-        i = 0
-        for it in Task.objects.filter(recipe=self).order_by("uid"):
-            if i == 0 and it.result in [FAIL, WARN, ABOART]:
+        failed_result = None
+        for result, statusbyuser, test_name in tasks:
+            if total == 0 and result in [FAIL, WARN, ABOART]:
                 self.result = FAILINSTALL
-                # self.save()
-            i += 1
 
-            if it.result == PASS or it.statusbyuser == WAIVED:
+            if result == PASS or statusbyuser == WAIVED:
                 total_ok += 1
             total += 1
 
-            if it.statusbyuser == WAIVED:
+            if statusbyuser == WAIVED:
                 waived = True
 
-            if it.result in [WARN, FAIL] and it.statusbyuser != WAIVED:
-                failed_test.append(it)
+            if result in [WARN, FAIL] and statusbyuser != WAIVED and \
+               failed_result is None:
+                failed_result = result
 
-            if it.result == NEW and not running:
-                running = it
+            if result == NEW and running is None:
+                running = test_name
 
         if waived:
-            if failed_test:
-                self.result = failed_test[0].result
+            if failed_result is not None:
+                self.result = failed_result
             else:
                 self.result = PASS
-            if running and running.test.name == settings.RESERVE_TEST \
-               and total_ok + 1 == total: self.set_waived()
+            if running == settings.RESERVE_TEST and total_ok + 1 == total:
+                self.statusbyuser = WAIVED
         if total != 0:
             self.resultrate = total_ok * 100. / total
         else:
             self.resultrate = 0
-        if waived and total_ok == total: self.set_waived()
+        if waived and total_ok == total:
+            self.statusbyuser = WAIVED
 
     def get_date(self):
         return self.job.date
@@ -1059,6 +1212,207 @@ class Task(models.Model):
         self.recipe.save()
 
 
+class RecipeMatrix(models.Model):
+    """
+        Precomputed cell of the matrix on the jobs page - recipes of the job
+        template with the same label in the day.
+    """
+    template = models.ForeignKey(JobTemplate)
+    label = models.CharField(max_length=255)
+    day = models.DateField(db_index=True)
+    # the last recipe in the day
+    recipe = models.ForeignKey(Recipe)
+    # uids of all recipes in the day (reschedules), separated by space
+    schedule = models.TextField(blank=True)
+    # number of tasks by result for every recipe {uid: {result: count}}
+    results = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = (("template", "label", "day"),)
+
+    def __unicode__(self):
+        return "%s %s %s" % (self.template_id, self.label, self.day)
+
+    def get_label(self):
+        # label is stored as rendered (escaped) html of render_lable
+        return mark_safe(self.label)
+
+    def get_schedule(self):
+        return self.schedule.split()
+
+    def get_results(self):
+        """
+            Return number of tasks by result for all recipes in the cell
+        """
+        data = dict()
+        for counts in json.loads(self.results or "{}").values():
+            for result, count in counts.items():
+                data[int(result)] = data.get(int(result), 0) + count
+        return data
+
+    @staticmethod
+    def get_day(date):
+        """
+            Day of the job in UTC, naive datetimes are in local time zone
+        """
+        return force_tz(date, settings.TIME_ZONE).astimezone(utc).date()
+
+    @staticmethod
+    def update(job, recipes):
+        """
+            Update cells of the job's recipes. The recipes are tuples
+            (recipe, list of task results), arch and distro of recipes
+            should be loaded (select_related).
+        """
+        template = job.template
+        day = RecipeMatrix.get_day(job.date)
+        cells = dict([(it.label, it) for it in RecipeMatrix.objects
+                      .filter(template=template, day=day)])
+        for recipe, results in recipes:
+            label = render_lable(recipe.get_dict(), template.grouprecipes)
+            cell = cells.get(label)
+            if not cell:
+                cell = RecipeMatrix(template=template, label=label, day=day,
+                                    recipe=recipe)
+                cells[label] = cell
+            schedule = cell.get_schedule()
+            if recipe.uid not in schedule:
+                schedule.append(recipe.uid)
+                schedule.sort(key=lambda x: int(x) if x.isdigit() else x)
+                cell.schedule = " ".join(schedule)
+            if schedule[-1] == recipe.uid:
+                cell.recipe = recipe
+            counts = dict()
+            for result in results:
+                counts[result] = counts.get(result, 0) + 1
+            data = json.loads(cell.results or "{}")
+            data[recipe.uid] = counts
+            cell.results = json.dumps(data)
+            cell.save()
+
+    @staticmethod
+    def rebuild(template=None):
+        """
+            Recompute matrix from recipes and tasks (all or only for one
+            job template).
+        """
+        cells = RecipeMatrix.objects.all()
+        jobs = Job.objects.select_related("template").order_by("uid")
+        if template:
+            cells = cells.filter(template=template)
+            jobs = jobs.filter(template=template)
+        cells.delete()
+        for job in jobs:
+            results = dict()
+            for recipe_id, result in Task.objects.filter(recipe__job=job)\
+                    .order_by("uid").values_list("recipe", "result"):
+                results.setdefault(recipe_id, []).append(result)
+            recipes = Recipe.objects.filter(job=job)\
+                            .select_related("arch", "distro").order_by("uid")
+            RecipeMatrix.update(job, [(it, results.get(it.id, []))
+                                      for it in recipes])
+
+
+class TestMatrix(models.Model):
+    """
+        Precomputed cell of the matrix on the tests page - tasks of the test
+        in recipes of the job template with the same label in the day.
+    """
+    test = models.ForeignKey(Test)
+    template = models.ForeignKey(JobTemplate)
+    label = models.CharField(max_length=255)
+    day = models.DateField(db_index=True)
+    # the last task in the day
+    task = models.ForeignKey(Task)
+    # uids of all tasks in the day (reschedules), separated by space
+    schedule = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = (("test", "template", "label", "day"),)
+
+    def __unicode__(self):
+        return "%s %s %s" % (self.test_id, self.label, self.day)
+
+    def get_label(self):
+        # label is stored as rendered (escaped) html of render_lable
+        return mark_safe(self.label)
+
+    def get_schedule(self):
+        return self.schedule.split()
+
+    @staticmethod
+    def update(job, tasks):
+        """
+            Add new tasks of the job to the cells. The tasks are tuples
+            (recipe, task id, task uid, test id, alias), arch and distro of
+            recipes should be loaded (select_related).
+        """
+        template = job.template
+        day = RecipeMatrix.get_day(job.date)
+        data = dict()
+        for recipe, task_id, uid, test_id, alias in tasks:
+            params = recipe.get_dict()
+            # the tests page uses full name of distro
+            params.update({"distro_label": recipe.distro.name, "alias": alias})
+            label = render_lable(params, template.grouprecipes)
+            data.setdefault((test_id, label), []).append((task_id, uid))
+        if not data:
+            return
+        cells = dict([((it.test_id, it.label), it) for it in TestMatrix.objects
+                      .filter(template=template, day=day,
+                              test__in=set([it[0] for it in data]))])
+        new_cells, changed = list(), dict()
+        for key, items in data.items():
+            cell = cells.get(key)
+            if not cell:
+                cell = TestMatrix(test_id=key[0], template=template,
+                                  label=key[1], day=day)
+            schedule = cell.get_schedule()
+            for task_id, uid in items:
+                if uid in schedule:
+                    continue
+                schedule.append(uid)
+                schedule.sort(key=lambda x: int(x) if x.isdigit() else x)
+                if schedule[-1] == uid:
+                    cell.task_id = task_id
+            if cell.id and " ".join(schedule) == cell.schedule:
+                continue
+            cell.schedule = " ".join(schedule)
+            if cell.id:
+                changed[cell.id] = (cell.task_id, cell.schedule)
+            else:
+                new_cells.append(cell)
+        bulk.update_by_id(TestMatrix, changed, ("task_id", "schedule"))
+        TestMatrix.objects.bulk_create(new_cells)
+
+    @staticmethod
+    def rebuild(template=None):
+        """
+            Recompute matrix and number of tasks of tests from recipes and
+            tasks (all or only for one job template).
+        """
+        cells = TestMatrix.objects.all()
+        jobs = Job.objects.select_related("template").order_by("uid")
+        if template:
+            cells = cells.filter(template=template)
+            jobs = jobs.filter(template=template)
+        cells.delete()
+        for job in jobs:
+            recipes = dict([(it.id, it) for it in Recipe.objects.filter(job=job)
+                            .select_related("arch", "distro")])
+            tasks = Task.objects.filter(recipe__job=job).order_by("uid")\
+                        .values_list("recipe", "id", "uid", "test", "alias")
+            TestMatrix.update(job, [(recipes[it[0]], ) + it[1:]
+                                    for it in tasks])
+        if not template:
+            counts = dict(Task.objects.values_list("test")
+                          .annotate(Count("id")).order_by())
+            Test.objects.update(task_count=0)
+            bulk.update_by_id(Test, dict([(test_id, (count, )) for
+                                          test_id, count in counts.items()
+                                          if test_id]), ("task_count", ))
+
+
 class PhaseLabel(models.Model):
     name = models.CharField(max_length=255, unique=True)
 
@@ -1082,7 +1436,8 @@ class SkippedPhase(models.Model):
 
 
 class CheckProgress(models.Model):
-    datestart = models.DateTimeField(default=currentDate())
+    CACHE_KEY = "core-checkprogress-last"
+    datestart = models.DateTimeField(default=currentDate)
     dateend = models.DateTimeField(null=True, blank=True)
     totalsum = models.IntegerField()
     actual = models.IntegerField(default=0)
@@ -1090,18 +1445,70 @@ class CheckProgress(models.Model):
     def __unicode__(self):
         return "%s" % self.datestart
 
-    def counter(self):
-        self.actual += 1
+    @staticmethod
+    def get_last():
+        """
+            Return the last check progress, it is cached for
+            CHECK_PROGRESS_CACHE_TIMEOUT seconds.
+        """
+        progress = cache.get(CheckProgress.CACHE_KEY)
+        if progress is None:
+            try:
+                progress = CheckProgress.objects.order_by("-datestart")[0]
+            except IndexError:
+                progress = False
+            cache.set(CheckProgress.CACHE_KEY, progress,
+                      settings.CHECK_PROGRESS_CACHE_TIMEOUT)
+        return progress or None
+
+    def counter(self, count=1):
+        """
+            Increase counter of checked jobs, the progress is saved every
+            CHECK_PROGRESS_FLUSH_JOBS jobs or CHECK_PROGRESS_FLUSH_SECONDS
+            seconds.
+        """
+        self.actual += count
+        flushed_at, flushed_actual = getattr(self, "_flushed", (None, 0))
+        if flushed_at is None or \
+           self.actual - flushed_actual >= settings.CHECK_PROGRESS_FLUSH_JOBS \
+           or time.time() - flushed_at >= settings.CHECK_PROGRESS_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
         self.save()
+        self._flushed = (time.time(), self.actual)
+        cache.set(CheckProgress.CACHE_KEY, self,
+                  settings.CHECK_PROGRESS_CACHE_TIMEOUT)
 
     def percent(self):
         if self.totalsum == 0:
             return None
         return int(self.actual * 100 / self.totalsum)
 
+    def throughput(self):
+        """
+            Return number of checked jobs per second
+        """
+        end = self.dateend or currentDate()
+        duration = (end - self.datestart).total_seconds()
+        if duration <= 0:
+            return None
+        return self.actual / duration
+
+    def eta(self):
+        """
+            Return estimated time (timedelta) to the end of check
+        """
+        if self.dateend:
+            return timedelta(0)
+        speed = self.throughput()
+        if not speed:
+            return None
+        return timedelta(seconds=int((self.totalsum - self.actual) / speed))
+
     def finished(self):
         self.dateend = currentDate()
-        self.save()
+        self.flush()
 
     def get_duration(self):
         if self.dateend:
@@ -9,7 +9,7 @@ from django.test import TestCase
 from django.test.client import Client
 from apps.core.utils.beaker_import import Parser
 from apps.core.models import RecipeTemplate
-from apps.core.utils.job_generator import JobGen, render_job
+from apps.core.utils.beaker import JobGen
 import difflib
 
 class ImportTest(TestCase):
@@ -25,8 +25,7 @@ class ImportTest(TestCase):
         self.assertEqual(len(recipes), num_recipes, msg="Number recipes is bad")
         self.assertEqual(s.job.position, 100, msg="job position is same")
 
-        job = JobGen(job=s.job, reserve=False)
-        xml = render_job(job, is_manual=True)
+        xml = JobGen().getXML(s.job, reserve=False)
         f = open(filename)
         xml_old = f.read()
         f.close()
@@ -61,3 +60,378 @@ class SimpleTest(TestCase):
         r = c.get("/tests.html")
         self.assertEqual(r.status_code, 200, msg="tests page is not running")
 
+
+import os
+import shutil
+import tempfile
+import xmlrpclib
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from django.core.exceptions import ImproperlyConfigured
+from apps.core.models import Job, Recipe, System
+from apps.core.utils import rate_limit, beaker_client
+from apps.core.utils.beaker import Beaker
+from apps.core.utils.beaker_client import BeakerClient
+from apps.core.utils.beaker_stub import BeakerStub
+
+JOB_XML = "<job><whiteboard>test</whiteboard></job>"
+
+
+class StubTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.stub = BeakerStub(("127.0.0.1", 0), jobs=5, require_login=True)
+        self.stub.start()
+        self.bkr = BeakerClient(self.stub.url, "tester", "secret")
+
+    def tearDown(self):
+        self.bkr.close()
+        self.stub.shutdown()
+        self.stub.server_close()
+
+
+class BeakerClientTest(StubTestCase):
+
+    def test_session_renewal(self):
+        self.assertEqual(self.bkr.job_submit(JOB_XML), "J:6")
+        # Beaker forgot the session, the upload is refused and repeated
+        # with a new session
+        self.stub.forget_sessions()
+        self.assertEqual(self.bkr.job_submit(JOB_XML), "J:7")
+        self.assertEqual(self.stub.methods["auth.login_password"], 2)
+        self.assertEqual(self.stub.methods["jobs.upload"], 3)
+        self.assertEqual(len(self.stub.submitted), 2)
+
+    def test_upload_fault_is_not_retried(self):
+        self.assertRaises(xmlrpclib.Fault, self.bkr.job_submit, "<job>")
+        self.assertEqual(self.stub.methods["jobs.upload"], 1)
+        self.assertEqual(self.stub.submitted, {})
+
+    def test_upload_error_is_not_retried(self):
+        self.bkr.job_submit(JOB_XML)
+        self.stub.unavailable = True
+        self.assertRaises(xmlrpclib.ProtocolError,
+                          self.bkr.job_submit, JOB_XML)
+        self.assertEqual(self.stub.methods["jobs.upload"], 2)
+        self.assertEqual(len(self.stub.submitted), 1)
+
+    def test_read_error_is_retried(self):
+        self.stub.unavailable = True
+        self.assertRaises(xmlrpclib.ProtocolError,
+                          self.bkr.jobs_filter, {})
+        self.assertEqual(self.stub.methods["jobs.filter"], 2)
+        self.stub.unavailable = False
+        self.assertEqual(len(self.bkr.jobs_filter({})), 5)
+
+
+class BeakerLoginTest(StubTestCase):
+
+    def setUp(self):
+        super(BeakerLoginTest, self).setUp()
+        with override_settings(BEAKER_OWNER=None, BEAKER_PASS=None):
+            self.bkr = BeakerClient(self.stub.url)
+        self.krbV = beaker_client.krbV
+        self.get_krbv_request = beaker_client.get_krbv_request
+
+    def tearDown(self):
+        beaker_client.krbV = self.krbV
+        beaker_client.get_krbv_request = self.get_krbv_request
+        super(BeakerLoginTest, self).tearDown()
+
+    def test_kerberos(self):
+        # python-krbV and the ticket are replaced
+        beaker_client.krbV = object()
+        beaker_client.get_krbv_request = lambda url: "request"
+        self.assertEqual(self.bkr.job_submit(JOB_XML), "J:6")
+        self.assertEqual(self.stub.methods["auth.login_krbv"], 1)
+
+    def test_no_credentials(self):
+        beaker_client.krbV = None
+        self.assertRaises(ImproperlyConfigured, self.bkr.job_submit, JOB_XML)
+        self.assertFalse("jobs.upload" in self.stub.methods)
+
+
+class BeakerActionsTest(StubTestCase):
+
+    def setUp(self):
+        super(BeakerActionsTest, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.limiter = rate_limit.limiter
+        rate_limit.limiter = rate_limit.TokenBucket(
+            path=os.path.join(self.tmp, "rate"), rate=1000, burst=1000)
+        self.settings = override_settings(BEAKER_SERVER=self.stub.url,
+                                          BEAKER_OWNER="tester",
+                                          BEAKER_PASS="secret")
+        self.settings.enable()
+
+    def tearDown(self):
+        beaker_client.close_client()
+        self.settings.disable()
+        rate_limit.limiter = self.limiter
+        shutil.rmtree(self.tmp)
+        super(BeakerActionsTest, self).tearDown()
+
+    def test_job_cancel(self):
+        self.assertTrue(Beaker().jobCancel(Job(uid="J:1")))
+        self.assertEqual(self.stub.cancelled, set(["J:1"]))
+
+    def test_job_cancel_fault(self):
+        self.assertFalse(Beaker().jobCancel(Job(uid="J:100")))
+        self.assertEqual(self.stub.methods["taskactions.stop"], 1)
+
+    def get_recipe(self, uid):
+        return Recipe(uid=uid, status=Recipe.RESERVED,
+                      system=System(hostname="host.example.com"))
+
+    def test_return2beaker(self):
+        self.assertTrue(Beaker().return2beaker(self.get_recipe("2")))
+        self.assertEqual(self.stub.methods["recipes.extend"], 1)
+
+    def test_return2beaker_fault(self):
+        self.assertFalse(Beaker().return2beaker(self.get_recipe("100000")))
+        self.assertEqual(self.stub.methods["recipes.extend"], 1)
+
+
+import json
+import time
+from apps.core.utils.rate_limit import TokenBucket
+
+
+class TokenBucketTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "rate")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def get_bucket(self, rate=20, burst=3):
+        return TokenBucket(path=self.path, rate=rate, burst=burst, slow=1,
+                           max_backoff=8)
+
+    def get_state(self):
+        with open(self.path) as fd:
+            return json.load(fd)
+
+    def test_burst(self):
+        bucket = self.get_bucket()
+        for it in range(3):
+            self.assertEqual(bucket.acquire(), 0)
+        # the next token is refilled after 1 / rate seconds
+        self.assertTrue(bucket.acquire() > 0)
+        self.assertTrue(bucket.waited <= 0.1)
+
+    def test_refill(self):
+        bucket = self.get_bucket()
+        for it in range(3):
+            bucket.acquire()
+        self.assertTrue(self.get_state()["tokens"] < 1)
+        time.sleep(0.2)
+        self.assertEqual(bucket.acquire(), 0)
+        # tokens are not refilled over burst
+        time.sleep(0.3)
+        bucket.acquire()
+        self.assertTrue(self.get_state()["tokens"] <= 2)
+
+    def test_backoff(self):
+        bucket = self.get_bucket()
+        self.assertEqual(bucket.report(False, 0.1), 2)
+        # slow response
+        self.assertEqual(bucket.report(True, 5), 4)
+        self.assertEqual(bucket.report(False, 0.1), 8)
+        self.assertEqual(bucket.report(False, 0.1), 8)
+        self.assertEqual(self.get_state()["backoff"], 8)
+        self.assertEqual(bucket.report(True, 0.1), 4)
+        self.assertEqual(bucket.report(True, 0.1), 2)
+        self.assertEqual(bucket.report(True, 0.1), 1)
+        self.assertEqual(bucket.report(True, 0.1), 1)
+        self.assertEqual((bucket.count, bucket.errors), (8, 3))
+
+    def test_backoff_decreases_rate(self):
+        bucket = self.get_bucket(rate=10, burst=1)
+        bucket.acquire()
+        bucket.report(False, 0.1)
+        # rate 10/s is halved, one token takes 0.2s
+        self.assertTrue(bucket.acquire() > 0.15)
+
+    def test_shared_tokens(self):
+        first, second = self.get_bucket(), self.get_bucket()
+        self.assertEqual(first.acquire(), 0)
+        self.assertEqual(second.acquire(), 0)
+        self.assertEqual(first.acquire(), 0)
+        # the burst is used by both instances together
+        self.assertTrue(second.acquire() > 0)
+        second.report(False, 0.1)
+        self.assertEqual(first.report(True, 0.1), 1)
+
+
+from django.test import TransactionTestCase
+from apps.taskomatic.models import Task as TaskomaticTask
+from apps.core.management.commands.checkrepo import Command as CheckRepo
+
+
+class CheckRepoTaskTest(TransactionTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_run_by_taskomatic(self):
+        # checkrepo runs own pool of processes in the worker of taskomatic
+        task = TaskomaticTask.objects.create(title="checkrepo",
+                                             common="checkrepo",
+                                             common_params="")
+        with override_settings(REPOSITORIES_GIT={}, CHECKREPO_WORKERS=2,
+                               DATA_GENERATION_FILE=os.path.join(
+                                   self.tmp, "generation")):
+            task.run(CheckRepo)
+        self.assertEqual(task.status, TaskomaticTask.STATUS_ENUM_DONE,
+                         msg=task.exit_result)
+
+
+from django.template import Context, Template
+from apps.core.utils.labels import SimpleLabel, CompiledLabel, render_lable
+
+
+class LabelTest(SimpleTestCase):
+
+    def test_simple_label(self):
+        rule = "<b>{{arch}}</b> {{whiteboard|nostartsdate}}"
+        data = {"arch": "x86_64 & <i386>",
+                "whiteboard": "2014-01-01 nightly"}
+        label = render_lable(data, rule)
+        self.assertTrue(isinstance(SimpleLabel(rule).render(data),
+                                   type(CompiledLabel(rule).render(data))))
+        self.assertEqual(label, CompiledLabel(rule).render(data))
+        # the label isn't escaped again in templates
+        self.assertEqual(Template("{{ label }}").render(
+            Context({"label": label})),
+            "<b>x86_64 &amp; &lt;i386&gt;</b> nightly")
+
+
+from apps.core.models import RecipeMatrix, TestMatrix
+
+
+class MatrixLabelTest(SimpleTestCase):
+    """
+        Labels of matrices are stored as rendered html (render_lable)
+    """
+
+    def render(self, cell):
+        return Template("{{ cell.get_label }}").render(Context({"cell": cell}))
+
+    def test_recipe_matrix(self):
+        cell = RecipeMatrix(label=u"<b>&lt;x86_64&gt;</b>")
+        self.assertEqual(self.render(cell), u"<b>&lt;x86_64&gt;</b>")
+
+    def test_test_matrix(self):
+        cell = TestMatrix(label=u"<b>&lt;x86_64&gt;</b>")
+        self.assertEqual(self.render(cell), u"<b>&lt;x86_64&gt;</b>")
+
+
+from django.db.models import Count
+from django.test.client import RequestFactory
+from apps.core.models import Author, Test, JobTemplate, Arch, Distro, Task
+from apps.core.models import GroupOwner
+from apps.core.models import FAIL, PASS
+from apps.core.views import TestsListView
+
+
+class FailedTestsPageTest(TestCase):
+
+    def setUp(self):
+        owner = Author.objects.create(name="Tester", email="t@example.com")
+        template = JobTemplate.objects.create(whiteboard="template")
+        job = Job.objects.create(template=template, uid="J:1")
+        recipe = Recipe.objects.create(
+            job=job, uid="1", whiteboard="",
+            system=System.objects.create(hostname="host"),
+            arch=Arch.objects.create(name="x86_64"),
+            distro=Distro.objects.create(name="distro"))
+        # (total tasks, failed tasks)
+        self.tests = list()
+        for name, total, failed in (("a", 5, 1), ("b", 2, 2), ("c", 3, 2)):
+            test = Test.objects.create(name=name, owner=owner,
+                                       task_count=total)
+            for it in range(total):
+                Task.objects.create(uid="%s%d" % (name, it), recipe=recipe,
+                                    test=test,
+                                    result=FAIL if it < failed else PASS)
+            self.tests.append(test)
+
+    def get_page(self, **params):
+        view = TestsListView()
+        view.request = RequestFactory().get("/tests.html", params)
+        tests = Test.objects.filter(task__result__in=[FAIL])\
+                    .annotate(count_fail=Count("task__result"))
+        return view.get_page(tests, 2, "count_fail")
+
+    def test_order_by_failed_tasks(self):
+        testlist, pages = self.get_page()
+        self.assertEqual([it.name for it in testlist], ["b", "c"])
+        self.assertEqual(pages["next"], "2_%d" % self.tests[2].id)
+        testlist, pages = self.get_page(after=pages["next"])
+        self.assertEqual([it.name for it in testlist], ["a"])
+        self.assertEqual(testlist[0].count_fail, 1)
+        testlist, pages = self.get_page(before=pages["previous"])
+        self.assertEqual([it.name for it in testlist], ["b", "c"])
+
+
+from apps.core.utils import generation
+
+
+class GenerationTest(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.settings = override_settings(
+            DATA_GENERATION_FILE=os.path.join(self.tmp, "generation"))
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.tmp)
+
+    def test_changed_by_models(self):
+        author = Author.objects.create(name="Tester", email="t@example.com")
+        self.assertEqual(generation.get(), 1)
+        test = Test.objects.create(name="/test", owner=author)
+        test.groups.add(GroupOwner.objects.create(name="group"))
+        self.assertEqual(generation.get(), 4)
+        test.delete()
+        self.assertTrue(generation.get() > 4)
+
+    def test_other_apps(self):
+        TaskomaticTask.objects.create(title="check", common="check")
+        self.assertEqual(generation.get(), 0)
+
+
+from apps.core.models import Git
+
+
+class DependenciesTest(TestCase):
+
+    def setUp(self):
+        self.git = Git.objects.create(name="tests", localurl="tests",
+                                      url="git://example.com/tests")
+        # the same suffix, the first test by name wins (ids are reversed)
+        self.second = Test.objects.create(name="/b/distribution/install")
+        self.first = Test.objects.create(name="/a/distribution/install")
+        self.test = Test.objects.create(name="/a/test")
+
+    def get_dependencies(self, *rows):
+        self.git._Git__updateDependences([(self.test, list(rows))])
+        return set(self.test.dependencies.values_list("name", flat=True))
+
+    def test_same_suffix(self):
+        self.assertEqual(self.get_dependencies("distribution/install"),
+                         set(["/a/distribution/install"]))
+
+    def test_part_of_name(self):
+        self.assertEqual(self.get_dependencies("test(ution/install)"),
+                         set(["/a/distribution/install"]))
+        self.assertEqual(self.get_dependencies("/b/distribution/install"),
+                         set(["/b/distribution/install"]))
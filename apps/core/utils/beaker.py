@@ -11,21 +11,29 @@
 
 import xmlrpclib
 import os
+import socket
+import hashlib
 import sys
 import re
 import urllib2
-import xml.dom.minidom
 import time
 import logging
 import pxssh
-import subprocess
+from cStringIO import StringIO
+from xml.etree import cElementTree as ElementTree
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.db import transaction
+from django.core.cache import cache
+from django.db.models import F, Q, signals
 from django.template.defaultfilters import slugify
 from django.template import Context, Template
 from apps.core.models import JobTemplate, RecipeTemplate, TaskTemplate
-from apps.core.models import Job, Recipe, Test, Task
+from apps.core.models import GroupTemplate, GroupTaskTemplate, GroupTestTemplate
+from apps.core.models import DistroTemplate, TaskRoleEnum
+from apps.core.models import Job, Recipe, Test, Task, RecipeMatrix, TestMatrix
 from apps.core.models import System, Arch, Distro, Author, PASS
+from apps.core.utils import lookup_cache, rate_limit, beaker_client, bulk
 
 logger = logging.getLogger('commands')
 
@@ -55,29 +63,30 @@ def strToSec(string):
 
 class Beaker:
 
-    def execute(self, command, param):
+    def request(self, method, *args):
         """
-            Execute beaker command
+            Call method of Beaker client, which changes data in Beaker.
+            All these requests are limited by shared rate limiter.
         """
-        auth = ""
-        if settings.BEAKER_OWNER:
-            auth = " --username=%s --password=%s" % (settings.BEAKER_OWNER,
-                                                    settings.BEAKER_PASS)
-        command = "bkr %s %s%s" % (command, param, auth)
-        p = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE)
-        return p.communicate()
+        rate_limit.limiter.acquire()
+        started, ok = time.time(), False
+        try:
+            result = getattr(beaker_client.get_client(), method)(*args)
+            ok = True
+            return result
+        finally:
+            rate_limit.limiter.report(ok, time.time() - started)
 
     def jobCancel(self, job, message=""):
         if not isinstance(job, Job) or not job:
             raise Exception("Parameter 'job' is not instance of class Job")
-        result = self.execute("job-cancel", "--msg \"%s\" %s" % (message,
-                                                                 job.uid))
-        if re.search("Cancelled\s+%s" % job.uid, result[0]):
-            return True
-        else:
-            logger.error("Problem with canceling of the job (%s). output: '%s'"
-                     (job.uid, "\n".join(result)))
+        try:
+            self.request("job_cancel", job.uid, message)
+        except (socket.error, xmlrpclib.Error) as e:
+            logger.error("Problem with canceling of the job (%s): %s"
+                         % (job.uid, e))
             return False
+        return True
 
     def jobSchedule(self, jobT, reserve=False, schedule=None):
         if not isinstance(jobT, JobTemplate) or not jobT:
@@ -136,12 +145,12 @@ class Beaker:
 
         # if system status is reserved
         try:
-            from returns import return_reservation
-            status = return_reservation(int(recipe.uid))
-            import sdsdssdsd
-            return (status == -1)
-        except ImportError:
-            logger.info("No module named bkr.client")
+            self.request("extend_reservation", int(recipe.uid), 0)
+        except (socket.error, xmlrpclib.Error) as e:
+            logger.error("Problem with return2beaker of the recipe (%s): %s"
+                         % (recipe.uid, e))
+            return False
+        return True
 
     def return2beaker_old(self, recipe):
         # better way: use fabric
@@ -180,8 +189,14 @@ class Beaker:
         if not os.path.isfile(xmlfile):
             logger.error("XML file '%s' does not exist." % xmlfile)
             return None
-        result = self.execute("job-submit", xmlfile)
-        return re.findall(r"'(J:[0-9]+)'", result[0])
+        with open(xmlfile) as fd:
+            xml = fd.read()
+        try:
+            return [self.request("job_submit", xml)]
+        except (socket.error, xmlrpclib.Error) as e:
+            logger.error("Problem with submitting of the file %s: %s"
+                         % (xmlfile, e))
+            return []
 
     def __jobSchedule(self, xmlfile, jobT):
         jobids = self.scheduleFromXmlFile(xmlfile)
@@ -194,29 +209,132 @@ class Beaker:
         return None
 
 
+# template of job xml, it is compiled only once
+with open(os.path.join(os.path.dirname(__file__), "beaker.xml")) as fd:
+    BEAKER_XML = Template(fd.read())
+
+# version of job templates in cache, it is increased by every change
+XML_VERSION_KEY = "jobxml:version"
+
+
+def invalidate_xml(sender, **kwargs):
+    """
+        Signal handler, all cached xmls are invalid after a change of job
+        templates (for example in admin).
+    """
+    try:
+        cache.incr(XML_VERSION_KEY)
+    except ValueError:
+        cache.set(XML_VERSION_KEY, 1)
+
+
+for model in (JobTemplate, RecipeTemplate, TaskTemplate, GroupTemplate,
+              GroupTaskTemplate, GroupTestTemplate, DistroTemplate,
+              TaskRoleEnum, Arch, Test):
+    signals.post_save.connect(invalidate_xml, sender=model,
+                              dispatch_uid="jobxml-save-%s" % model.__name__)
+    signals.post_delete.connect(invalidate_xml, sender=model,
+                                dispatch_uid="jobxml-del-%s" % model.__name__)
+signals.m2m_changed.connect(invalidate_xml,
+                            sender=RecipeTemplate.arch.through,
+                            dispatch_uid="jobxml-m2m")
+
+
 class JobGen:
+    """
+        Generator of job xml from JobTemplate. The whole tree of the
+        template (recipes, guests, archs, groups of tests and tasks) is
+        loaded in the fixed number of queries and xml is rendered only from
+        this snapshot.
+    """
+
+    def __init__(self):
+        self.snapshot = dict()
+
+    def load(self, jobTs):
+        """
+            Load trees of more templates together (it is useful for
+            scheduling of more jobs).
+        """
+        jobTs = dict([(it.id, it) for it in jobTs])
+        if not jobTs:
+            return
+        recipes = dict()
+        for recipeT in RecipeTemplate.objects\
+                .filter(Q(jobtemplate__in=jobTs.keys()) |
+                        Q(virtualhost__jobtemplate__in=jobTs.keys()))\
+                .select_related("distro").order_by("name", "id"):
+            recipeT.cache_archs = list()
+            recipeT.cache_guests = list()
+            recipeT.cache_groups = list()
+            recipeT.cache_direct_tasks = list()
+            recipes[recipeT.id] = recipeT
+
+        through = RecipeTemplate.arch.through
+        for it in through.objects.filter(recipetemplate__in=recipes.keys())\
+                .select_related("arch").order_by("arch__name"):
+            recipes[it.recipetemplate_id].cache_archs.append(it.arch)
+
+        names = set()
+        for recipeT in recipes.values():
+            names |= set([it[0] for it in recipeT.parse(recipeT.schedule)])
+        arch_map = dict()
+        if names:
+            arch_map = dict([(it.name, it) for it in
+                             Arch.objects.filter(name__in=names)])
+
+        groups = dict()
+        for taskG in GroupTaskTemplate.objects\
+                .filter(recipe__in=recipes.keys())\
+                .select_related("group").order_by("priority", "id"):
+            recipes[taskG.recipe_id].cache_groups.append(taskG)
+            groups.setdefault(taskG.group_id, list())
+        for taskT in GroupTestTemplate.objects\
+                .filter(group__in=groups.keys(), test__is_enable=True)\
+                .select_related("test", "role").order_by("priority", "id"):
+            groups[taskT.group_id].append(taskT)
+
+        for taskT in TaskTemplate.objects\
+                .filter(recipe__in=recipes.keys(), test__is_enable=True)\
+                .select_related("test", "role").order_by("priority", "id"):
+            recipes[taskT.recipe_id].cache_direct_tasks.append(taskT)
+
+        for jobT in jobTs.values():
+            self.snapshot[jobT.id] = list()
+        for recipeT in sorted(recipes.values(),
+                              key=lambda it: (it.name, it.id)):
+            recipeT.cache_archs = recipeT.getArchsForToday(
+                archs=recipeT.cache_archs, arch_map=arch_map)
+            recipeT.cache_tests = [(taskG, groups[taskG.group_id])
+                                   for taskG in recipeT.cache_groups]
+            if recipeT.virtualhost_id in recipes:
+                recipes[recipeT.virtualhost_id].cache_guests.append(recipeT)
+            if not recipeT.is_virtualguest and \
+                    recipeT.jobtemplate_id in jobTs:
+                recipeT.jobtemplate = jobTs[recipeT.jobtemplate_id]
+                self.snapshot[recipeT.jobtemplate_id].append(recipeT)
 
     def getXML(self, jobT, reserve=False, **kwargs):
-        recipesT = RecipeTemplate.objects\
-            .filter(jobtemplate=jobT, is_virtualguest=False)
-            # .select_related("distro", "virtualguests")
+        """
+            Return xml of job, it is cached by hash of whole tree of the
+            template (see getKey), the key is kept in self.cache_key.
+        """
+        if jobT.id not in self.snapshot:
+            self.load([jobT])
         recipesS = list()
-        for recipeT in recipesT:
-            if len(recipeT.getArchsForToday()) == 0:
+        for recipeT in self.snapshot[jobT.id]:
+            if len(recipeT.cache_archs) == 0:
                 raise Exception("JobTemplate %d: arch is not set" % jobT.id)
 
-            recipeT.cache_tasks = self.__generateRecipe(recipeT, jobT, reserve)
-            recipeT.cache_guests = list()
+            recipeT.cache_tasks = self.__generateRecipe(recipeT)
             recipesS.append(recipeT)
 
-            recipeT.cache_reserve = recipeT.is_reserve()
+            recipeT.cache_reserve = not jobT.is_return()
             if reserve:
                 recipeT.cache_reserve = True
 
-            for gRecipeT in recipeT.virtualguests.all():
-                gRecipeT.cache_tasks = self.__generateRecipe(gRecipeT, jobT,
-                                                             reserve)
-                recipeT.cache_guests.append(gRecipeT)
+            for gRecipeT in recipeT.cache_guests:
+                gRecipeT.cache_tasks = self.__generateRecipe(gRecipeT)
 
         # if schedule plan doesn't exist then used all of archs to schedule
         if len(recipesS) == 0:
@@ -225,38 +343,57 @@ class JobGen:
         jobT.cache_recipes = recipesS
         kwargs['job'] = jobT
         kwargs['default_packages'] = settings.BEAKER_DEFAULT_PACKAGES
-        return self.__renderXML(kwargs)
+        self.cache_key = self.getKey(jobT, kwargs)
+        xml = cache.get(self.cache_key)
+        if xml is None:
+            xml = self.__renderXML(kwargs)
+            cache.set(self.cache_key, xml, settings.JOB_XML_CACHE_TIMEOUT)
+        return xml
+
+    def getKey(self, jobT, kwargs):
+        """
+            Key of xml in cache - hash of all values which are used in
+            beaker.xml (template, recipes with archs for today, guests and
+            tasks with params) and version of templates (see invalidate_xml).
+        """
+        def fields(obj):
+            if obj is None:
+                return None
+            return [getattr(obj, it.attname) for it in obj._meta.fields]
+
+        def recipe(recipeT):
+            return (fields(recipeT), fields(recipeT.distro),
+                    [it.name for it in recipeT.cache_archs],
+                    [(it["name"], sorted(it["params"].items()),
+                      it["priority"], it["get_role"]()) for it in
+                     recipeT.cache_tasks],
+                    getattr(recipeT, "cache_reserve", None),
+                    [recipe(it) for it in recipeT.cache_guests])
+
+        data = (fields(jobT), [recipe(it) for it in jobT.cache_recipes],
+                sorted([(key, value) for key, value in kwargs.items()
+                        if key != "job"]))
+        return "jobxml:%s:%s" % (cache.get(XML_VERSION_KEY, 0),
+                                 hashlib.sha1(repr(data)).hexdigest())
 
     def __renderXML(self, kwargs):
-        path = os.path.dirname(__file__)
-        with open("%s/%s" % (path, "beaker.xml")) as fd:
-            return re.sub(r'((?<=\>)|^)\s*((?=\<)|$)', '',
-                          Template(fd.read()).render(Context(kwargs)))
+        return re.sub(r'((?<=\>)|^)\s*((?=\<)|$)', '',
+                      BEAKER_XML.render(Context(kwargs)))
 
-    def __generateRecipe(self, recipeT, jobT, reserve):
+    def __generateRecipe(self, recipeT):
         cache_tasks = list()
-        params = {}
-        for taskG in recipeT.grouptemplates.order_by("priority"):
+        for taskG, tests in recipeT.cache_tests:
             params = taskG.get_params()
-            for taskT in taskG.group.grouptests.order_by("priority"):
-                if not taskT.test.is_enable: continue
-                params2 = taskT.get_params()
-                params2.update(params)
-                taskT.parent_params = params2
-                cache_tasks.append(self.__generateTask(taskT))
+            for taskT in tests:
+                cache_tasks.append(self.__generateTask(taskT, params))
 
-
-
-        tasksT = TaskTemplate.objects.filter(recipe=recipeT)\
-                    .select_related("test").order_by("priority").distinct()
-        for taskT in tasksT:
-            if not taskT.test.is_enable: continue
+        for taskT in recipeT.cache_direct_tasks:
             cache_tasks.append(self.__generateTask(taskT))
         return cache_tasks
 
-    def __generateTask(self, taskT):
+    def __generateTask(self, taskT, parent_params=None):
         params = taskT.get_params()
-        hasattr(taskT, "parent_params") and params.update(taskT.parent_params)
+        parent_params and params.update(parent_params)
         return {"name": taskT.test.name,
                 "params": params,
                 "priority": taskT.priority,
@@ -265,118 +402,202 @@ class JobGen:
                }
 
 
-def parse_task(taskxml, recipe):
-
-#   stat = dict()
-#    for result in taskxml.childNodes:
-#        for it in result.childNodes:
-#            #print it.getAttribute("id"), it.getAttribute("result")
-#            res = it.getAttribute("result")
-#            if not res: continue
-#            if stat.has_key(res):
-#                stat[res] += 1
-#            else:
-#                stat[res] = 1
-
-    testname = taskxml.getAttribute("name")
-    test, status = Test.objects.get_or_create(name=testname, defaults={
-        "owner": Author.parseAuthor("")
-    })
-
-    uid = taskxml.getAttribute("id")
-    status_str = taskxml.getAttribute("status")
-    result = taskxml.getAttribute("result")
-
-    task_alias = None
-    for params in taskxml.getElementsByTagName("params"):
-        for param in params.getElementsByTagName("param"):
-            if param.getAttribute("name") == "TASK_ALIAS":
-                task_alias = param.getAttribute("value")
-
-    # # Download data from journal.xml
-    # task_full_xml = None
-    # response = None
-    # try:
-    #  response = urllib2.urlopen(settings.BEAKER_TASK_LOG+"%s+/%s/journal.xml")
-    #  task_full_xml = parse(response)
-    # except:
-    #  pass
-    # finally:
-    #  if response:
-    #    response.close()
-    #
-    # if task_full_xml:
-    #   task_full_xml.getElementsByTagName('starttime')[0].childNodes[0].nodeValue.strip()
-
-
-    task, status = Task.objects.get_or_create(
-        uid=uid,
-        defaults={
-            "recipe": recipe,
-            "test": test,
-            "alias": task_alias,
-        }
-    )
-    task.set_result(result)
-    task.set_status(status_str)
-
-    # journal = otask.load_journal()
-    # if journal:
-    #    print "journal: ", journal
-    #    print parseJournals(journal)
-
-    if task.is_completed():
-        task.duration = float(strToSec(taskxml.getAttribute("duration")))
-    task.save()
-
-def parse_recipe(recipexml, job, guestrecipe=None):
-    uid = recipexml.getAttribute("id")
-    hostname = recipexml.getAttribute("system")
-    str_arch = recipexml.getAttribute("arch")
-    str_distro = recipexml.getAttribute("distro")
-    whiteboard = recipexml.getAttribute("whiteboard")
-    str_status = recipexml.getAttribute("status")
-    str_result = recipexml.getAttribute("result")
-
-    system, status = System.objects.get_or_create(
-        hostname=hostname,
-    )
-
-    arch, status = Arch.objects.get_or_create(
-        name=str_arch,
-    )
-
-    distro, status = Distro.objects.get_or_create(
-        name=str_distro,
-    )
-
-    recipe, status = Recipe.objects.get_or_create(
-        uid=uid,
-        defaults={
-            "job": job,
-            "system": system,
-            "whiteboard": whiteboard,
-            "distro": distro,
-            "arch": arch }
-    )
-    recipe.system = system
-    recipe.set_result(str_result)
-    recipe.set_status(str_status)
-    if status:
-        recipe.save()
-
-    for dataxml in recipexml.childNodes:
-        if dataxml.tagName == "guestrecipe" and not guestrecipe:
-            parse_recipe(dataxml, job, recipe)
-        if dataxml.tagName == "task":
-            parse_task(dataxml, recipe)
-
-    recipe.recount_result()
-    recipe.save()
-
-    reserve = Task.objects.filter(test__name=settings.RESERVE_TEST, recipe=recipe)
-
-    if reserve or (recipe.status == Recipe.RESERVED and job.template.is_return()):
+def iter_recipes(content):
+    """
+        Incremental parser of job xml from beaker. It yields recipes as
+        the simple dicts with lists of tasks and guest recipes:
+
+            {"uid": .., "system": .., "arch": .., "distro": ..,
+             "whiteboard": .., "status": .., "result": ..,
+             "tasks": [{"uid": .., "name": .., "status": .., "result": ..,
+                        "duration": .., "alias": ..}, ...],
+             "guests": [<recipe>, ...]}
+
+        The DOM of whole job is never built, every element is removed from
+        the tree immediately after it is consumed.
+    """
+    if isinstance(content, unicode):
+        content = content.encode("utf-8")
+    stack, recipes = list(), list()
+    for event, elem in ElementTree.iterparse(StringIO(content),
+                                             events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if elem.tag in ("recipe", "guestrecipe"):
+                recipes.append({
+                    "uid": elem.get("id"),
+                    "system": elem.get("system", ""),
+                    "arch": elem.get("arch", ""),
+                    "distro": elem.get("distro", ""),
+                    "whiteboard": elem.get("whiteboard", ""),
+                    "status": elem.get("status", ""),
+                    "result": elem.get("result", ""),
+                    "tasks": [],
+                    "guests": [],
+                })
+            continue
+
+        stack.pop()
+        if elem.tag == "task" and recipes:
+            task_alias = None
+            for param in elem.iter("param"):
+                if param.get("name") == "TASK_ALIAS":
+                    task_alias = param.get("value")
+            recipes[-1]["tasks"].append({
+                "uid": elem.get("id"),
+                "name": elem.get("name"),
+                "status": elem.get("status", ""),
+                "result": elem.get("result", ""),
+                "duration": elem.get("duration", ""),
+                "alias": task_alias,
+            })
+        elif elem.tag == "guestrecipe":
+            recipe = recipes.pop()
+            if recipes:
+                recipes[-1]["guests"].append(recipe)
+        elif elem.tag == "recipe":
+            yield recipes.pop()
+        else:
+            continue
+        # free the consumed subtree
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+
+
+# fields of tasks and recipes, which are changed by parse_job
+TASK_FIELDS = ("result", "status", "duration")
+RECIPE_FIELDS = ("system_id", "result", "status", "resultrate",
+                 "statusbyuser")
+
+
+def parse_job(job, recipes):
+    """
+        Save recipes and tasks of the job to DB. The recipes are dicts
+        returned by iter_recipes.
+
+        All tests, systems, archs and distros are resolved by the lookup
+        cache (max. one query per model for missing values), tasks are
+        created by bulk_create, changed tasks and recipes are updated by
+        one statement, so number of queries doesn't depend on number of
+        tasks in the job.
+    """
+    # flat list of (recipe, is_guest), guest recipes follow their host
+    items = list()
+    for it in recipes:
+        items.append((it, False))
+        items.extend([(guest, True) for guest in it["guests"]])
+    if not items:
+        return []
+
+    systems = lookup_cache.systems.get_ids([it["system"] for it, g in items])
+    archs = lookup_cache.archs.get_ids([it["arch"] for it, g in items])
+    distros = lookup_cache.distros.get_ids([it["distro"] for it, g in items])
+    tests = lookup_cache.tests.get_ids(
+        [t["name"] for it, g in items for t in it["tasks"]])
+
+    with transaction.commit_on_success():
+        # Recipes
+        uids = [it["uid"] for it, g in items]
+        orecipes = dict([(it.uid, it) for it in Recipe.objects
+                         .filter(uid__in=uids)
+                         .select_related("arch", "distro")])
+        new_recipes = list()
+        for it, g in items:
+            if it["uid"] in orecipes:
+                continue
+            recipe = Recipe(uid=it["uid"], job=job,
+                            system_id=systems[it["system"]],
+                            whiteboard=it["whiteboard"],
+                            distro_id=distros[it["distro"]],
+                            arch_id=archs[it["arch"]])
+            recipe.set_result(it["result"])
+            recipe.set_status(it["status"])
+            new_recipes.append(recipe)
+        if new_recipes:
+            Recipe.objects.bulk_create(new_recipes)
+            orecipes.update([(it.uid, it) for it in Recipe.objects
+                             .filter(uid__in=[r.uid for r in new_recipes])
+                             .select_related("arch", "distro")])
+
+        # Tasks
+        tuids = [t["uid"] for it, g in items for t in it["tasks"]]
+        otasks = dict([(it["uid"], it) for it in Task.objects
+                       .filter(uid__in=tuids)
+                       .values("id", "uid", "result", "status", "duration",
+                               "statusbyuser")])
+        new_tasks = list()
+        updates = dict()
+        # (result, statusbyuser, test name) of tasks for recount_result
+        recipe_tasks = dict()
+        for it, g in items:
+            recipe = orecipes[it["uid"]]
+            recipe_tasks[it["uid"]] = rtasks = list()
+            for t in it["tasks"]:
+                if t["uid"] in otasks:
+                    old = otasks[t["uid"]]
+                    task = Task(id=old["id"], uid=t["uid"],
+                                result=old["result"], status=old["status"],
+                                duration=old["duration"],
+                                statusbyuser=old["statusbyuser"])
+                else:
+                    task = Task(uid=t["uid"], recipe_id=recipe.id,
+                                test_id=tests[t["name"]], alias=t["alias"])
+                task.set_result(t["result"])
+                task.set_status(t["status"])
+                if task.is_completed():
+                    task.duration = float(strToSec(t["duration"]))
+                rtasks.append((task.result, task.statusbyuser, t["name"]))
+                if not task.id:
+                    new_tasks.append(task)
+                    continue
+                values = (task.result, task.status, task.duration)
+                if values != (old["result"], old["status"], old["duration"]):
+                    updates[task.id] = values
+        if new_tasks:
+            Task.objects.bulk_create(new_tasks)
+            ids = dict(Task.objects.filter(uid__in=[it.uid for it in new_tasks])
+                                   .values_list("uid", "id"))
+            recipes = dict([(it.id, it) for it in orecipes.values()])
+            TestMatrix.update(job, [(recipes[it.recipe_id], ids[it.uid],
+                                     it.uid, it.test_id, it.alias)
+                                    for it in new_tasks])
+            counts = dict()
+            for it in new_tasks:
+                counts[it.test_id] = counts.get(it.test_id, 0) + 1
+            # one UPDATE for each distinct number of new tasks
+            increments = dict()
+            for test_id, count in counts.items():
+                increments.setdefault(count, []).append(test_id)
+            for count, test_ids in increments.items():
+                Test.objects.filter(id__in=test_ids)\
+                            .update(task_count=F("task_count") + count)
+        # changed tasks and recipes are updated by one statement
+        bulk.update_by_id(Task, updates, TASK_FIELDS)
+
+        res, rupdates = list(), dict()
+        for it, g in items:
+            recipe = orecipes[it["uid"]]
+            old = [getattr(recipe, field) for field in RECIPE_FIELDS]
+            recipe.system_id = systems[it["system"]]
+            recipe.set_result(it["result"])
+            recipe.set_status(it["status"])
+            recipe.recount_result(recipe_tasks[it["uid"]])
+            values = tuple([getattr(recipe, field) for field in RECIPE_FIELDS])
+            if list(values) != old:
+                rupdates[recipe.id] = values
+            res.append((recipe, it))
+        bulk.update_by_id(Recipe, rupdates, RECIPE_FIELDS)
+        RecipeMatrix.update(job, [(recipe, [t[0] for t in
+                                            recipe_tasks[it["uid"]]])
+                                  for recipe, it in res])
+
+    for recipe, it in res:
+        reserve = [t for t in it["tasks"]
+                   if t["name"] == settings.RESERVE_TEST]
+        if reserve or (recipe.status == Recipe.RESERVED and
+                       job.template.is_return()):
             if recipe.result == PASS:
                 bk = Beaker()
                 bk.return2beaker(recipe)
+    return [recipe for recipe, it in res]
@@ -0,0 +1,206 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import base64
+import socket
+import logging
+import urlparse
+import threading
+import xmlrpclib
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.importlib import import_module
+
+try:
+    import krbV
+except ImportError:
+    krbV = None
+
+logger = logging.getLogger('commands')
+
+
+class SessionTransportMixin:
+    """
+        Transport which keeps cookies of the session (Beaker sets
+        the authentication cookie by auth.login_password) and sends them
+        with every next request. The HTTP connection is kept alive by
+        xmlrpclib (HTTP/1.1).
+    """
+
+    def send_host(self, connection, host):
+        xmlrpclib.Transport.send_host(self, connection, host)
+        cookies = getattr(self, "cookies", None)
+        if cookies:
+            connection.putheader("Cookie", "; ".join(
+                ["%s=%s" % it for it in cookies.items()]))
+
+    def parse_response(self, response):
+        for header in response.msg.getheaders("Set-Cookie"):
+            name, value = header.split(";", 1)[0].split("=", 1)
+            if not hasattr(self, "cookies"):
+                self.cookies = dict()
+            self.cookies[name.strip()] = value.strip()
+        return xmlrpclib.Transport.parse_response(self, response)
+
+
+class SessionTransport(SessionTransportMixin, xmlrpclib.Transport):
+    pass
+
+
+class SafeSessionTransport(SessionTransportMixin, xmlrpclib.SafeTransport):
+    pass
+
+
+def get_krbv_request(url):
+    """
+        Kerberos request for auth.login_krbv (the same as bkr sends), the
+        ticket is taken from default credential cache.
+    """
+    ctx = krbV.default_context()
+    realm = settings.BEAKER_KRB_REALM or ctx.default_realm
+    ccache = ctx.default_ccache()
+    server = ctx.principal("%s/%s@%s" % (settings.BEAKER_KRB_SERVICE,
+                                         urlparse.urlparse(url).hostname,
+                                         realm))
+    ac = krbV.AuthContext(context=ctx)
+    ac.flags = krbV.KRB5_AUTH_CONTEXT_DO_SEQUENCE | \
+        krbV.KRB5_AUTH_CONTEXT_DO_TIME
+    ac.rcache = ctx.default_rcache()
+    ac, request = ctx.mk_req(server=server, client=ccache.principal(),
+                             auth_context=ac, ccache=ccache,
+                             options=krbV.AP_OPTS_MUTUAL_REQUIRED)
+    return base64.encodestring(request)
+
+
+def is_auth_fault(fault):
+    message = fault.faultString.lower()
+    return "login" in message or "anonymous" in message
+
+
+class BeakerClient(object):
+    """
+        Client of Beaker XML-RPC API. It keeps one authenticated session
+        and one HTTP connection, which are reused by all calls. The session
+        is renewed when Beaker forgets it.
+    """
+
+    def __init__(self, server=None, username=None, password=None):
+        server = server or settings.BEAKER_SERVER
+        if not server.startswith("http"):
+            server = "https://%s" % server
+        self.url = "%s/RPC2" % server.rstrip("/")
+        self.username = username or settings.BEAKER_OWNER
+        self.password = password or settings.BEAKER_PASS
+        self.proxy = None
+        self.is_logged = False
+
+    def connect(self):
+        if self.url.startswith("https"):
+            transport = SafeSessionTransport()
+        else:
+            transport = SessionTransport()
+        self.proxy = xmlrpclib.ServerProxy(self.url, transport=transport,
+                                           allow_none=True)
+        self.is_logged = False
+        return self.proxy
+
+    def login(self):
+        """
+            Log in by BEAKER_OWNER and BEAKER_PASS or by kerberos ticket.
+        """
+        if self.username:
+            self.proxy.auth.login_password(self.username, self.password)
+        elif krbV is not None:
+            self.proxy.auth.login_krbv(get_krbv_request(self.url))
+        else:
+            raise ImproperlyConfigured(
+                "No credentials for Beaker, set BEAKER_OWNER and "
+                "BEAKER_PASS or install python-krbV for kerberos auth")
+        self.is_logged = True
+
+    def call(self, method, *args, **kwargs):
+        """
+            Call XML-RPC method (for example "jobs.filter"), `login` is
+            required for actions which change data in Beaker.
+        """
+        login = kwargs.get("login", False)
+        for attempt in (1, 2):
+            if self.proxy is None:
+                self.connect()
+            try:
+                if login and not self.is_logged:
+                    self.login()
+                func = self.proxy
+                for name in method.split("."):
+                    func = getattr(func, name)
+                return func(*args)
+            except (socket.error, xmlrpclib.ProtocolError,
+                    xmlrpclib.Fault) as e:
+                # session expired or connection failed, try it again with
+                # a new connection and session (actions which change data
+                # are repeated only after an auth fault - never twice)
+                if isinstance(e, xmlrpclib.Fault):
+                    retry = is_auth_fault(e)
+                else:
+                    retry = not login
+                if attempt == 2 or not retry:
+                    raise
+                logger.warning("Beaker call %s failed (%s), reconnect"
+                               % (method, e))
+                self.proxy = None
+
+    def close(self):
+        """
+            Close the kept alive connection, the next call opens a new one.
+        """
+        if self.proxy is not None:
+            self.proxy("close")()
+            self.proxy = None
+
+    def jobs_filter(self, filter):
+        return self.call("jobs.filter", filter)
+
+    def task_info(self, uid):
+        return self.call("taskactions.task_info", uid)
+
+    def to_xml(self, uid):
+        return self.call("taskactions.to_xml", uid)
+
+    def job_submit(self, xml):
+        """
+            Submit job xml, return uid of the new job (J:123).
+        """
+        return self.call("jobs.upload", xml, login=True)
+
+    def job_cancel(self, uid, message=""):
+        return self.call("taskactions.stop", uid, "cancel", message,
+                         login=True)
+
+    def extend_reservation(self, recipe_id, seconds):
+        return self.call("recipes.extend", recipe_id, seconds, login=True)
+
+
+local = threading.local()
+
+
+def get_client():
+    """
+        Return client of Beaker for the actual thread (xmlrpclib is not
+        thread safe), class of client is set by BEAKER_CLIENT, so tests
+        can use a stub.
+    """
+    key = (settings.BEAKER_CLIENT, settings.BEAKER_SERVER)
+    if getattr(local, "key", None) != key:
+        module, name = settings.BEAKER_CLIENT.rsplit(".", 1)
+        local.client = getattr(import_module(module), name)()
+        local.key = key
+    return local.client
+
+
+def close_client():
+    """
+        Close connection of client of the actual thread (if it exists).
+    """
+    client = getattr(local, "client", None)
+    if client is not None:
+        client.close()
@@ -19,6 +19,7 @@ from django.template.defaultfilters import slugify
 from django.conf import settings
 
 from apps.core.models import *
+from apps.core.utils import lookup_cache
 
 
 class Parser:
@@ -113,15 +114,13 @@ class Parser:
             sub = archname.replace("x86_64", "x86-64")
             for it in sub.split("_")[2:]:
                 it = it.replace("x86-64", "x86_64")
-                arch, status = Arch.objects.get_or_create(name=it)
-                rt.arch.add(arch)
+                rt.arch.add(lookup_cache.archs.get_id(it))
         else:
-            arch, status = Arch.objects.get_or_create(name=archname)
-            rt.arch.add(arch)
+            rt.arch.add(lookup_cache.archs.get_id(archname))
         counter = 0
+        test_ids = lookup_cache.tests.get_ids([key for key, it, role in tests])
         for key, it, role in tests:
-            oTest, status = Test.objects.get_or_create(name=key)
-            tt = TaskTemplate(test=oTest, recipe=rt)
+            tt = TaskTemplate(test_id=test_ids[key], recipe=rt)
             tt.priority = counter
             tt.set_role(role)
             for param in it:
@@ -0,0 +1,219 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import time
+import socket
+import threading
+import xmlrpclib
+from SocketServer import ThreadingMixIn
+from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+from xml.etree import cElementTree as ElementTree
+
+RESULTS = ("Pass", "Pass", "Pass", "Fail", "Warn")
+COOKIE = "beaker_auth_token"
+# methods which change data, they are refused without login (require_login)
+LOGIN_REQUIRED = ("jobs.upload", "taskactions.stop", "recipes.extend")
+
+
+class StubRequestHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ("/RPC2",)
+    # keep-alive connections, like the real Beaker
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if not self.server.unavailable:
+            return SimpleXMLRPCRequestHandler.do_POST(self)
+        # Beaker is down, the request is counted but not processed
+        data = self.rfile.read(int(self.headers["content-length"]))
+        self.server.count(xmlrpclib.loads(data)[1])
+        self.send_response(503)
+        self.send_header("Content-length", "0")
+        self.end_headers()
+
+    def _dispatch(self, method, params):
+        return self.server.dispatch(method, params,
+                                    self.headers.get("Cookie", ""))
+
+    def end_headers(self):
+        if getattr(self.server, "set_cookie", None):
+            self.send_header("Set-Cookie", "%s=%s; Path=/"
+                             % (COOKIE, self.server.set_cookie))
+            self.server.set_cookie = None
+        SimpleXMLRPCRequestHandler.end_headers(self)
+
+
+class BeakerStub(ThreadingMixIn, SimpleXMLRPCServer):
+    """
+        Fake Beaker XML-RPC server for benchmarks and tests. It serves
+        `jobs` of synthetic jobs (J:1 ... J:<jobs>), every job has `recipes`
+        recipes with `tasks` tasks and `guests` guest recipes in every
+        recipe. Every call is delayed by `latency` seconds.
+
+        With `require_login` the actions which change data are refused
+        without a session (forget_sessions simulates expired sessions),
+        `unavailable` answers all requests by HTTP error 503.
+
+            stub = BeakerStub(("127.0.0.1", 0), jobs=100)
+            stub.start()
+            settings.BEAKER_SERVER = stub.url
+    """
+    daemon_threads = True
+
+    def __init__(self, address, jobs=100, recipes=2, tasks=10, guests=0,
+                 latency=0.0, templates=10, require_login=False):
+        SimpleXMLRPCServer.__init__(self, address, StubRequestHandler,
+                                    logRequests=False, allow_none=True)
+        self.jobs, self.recipes, self.tasks = jobs, recipes, tasks
+        self.guests, self.latency, self.templates = guests, latency, templates
+        self.require_login, self.unavailable = require_login, False
+        self.submitted, self.cancelled = dict(), set()
+        self.set_cookie, self.sessions = None, set()
+        self.lock = threading.Lock()
+        # open (kept alive) connections of clients
+        self.connections = set()
+        # number of all calls and of calls by method
+        self.calls, self.methods = 0, dict()
+        for name, func in (
+                ("auth.login_password", self.login_password),
+                ("auth.login_krbv", self.login_krbv),
+                ("jobs.filter", self.jobs_filter),
+                ("jobs.upload", self.jobs_upload),
+                ("taskactions.task_info", self.task_info),
+                ("taskactions.to_xml", self.to_xml),
+                ("taskactions.stop", self.stop),
+                ("recipes.extend", self.extend)):
+            self.register_function(func, name)
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self.server_address
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def get_request(self):
+        request, address = SimpleXMLRPCServer.get_request(self)
+        with self.lock:
+            self.connections.add(request)
+        return request, address
+
+    def shutdown_request(self, request):
+        with self.lock:
+            self.connections.discard(request)
+        SimpleXMLRPCServer.shutdown_request(self, request)
+
+    def server_close(self):
+        """
+            Close the server and drop kept alive connections, so threads of
+            the handlers finish before exit of the interpreter.
+        """
+        SimpleXMLRPCServer.server_close(self)
+        with self.lock:
+            connections = list(self.connections)
+        for it in connections:
+            try:
+                it.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        deadline = time.time() + 5
+        while self.connections and time.time() < deadline:
+            time.sleep(0.01)
+
+    def count(self, method):
+        with self.lock:
+            self.calls += 1
+            self.methods[method] = self.methods.get(method, 0) + 1
+
+    def dispatch(self, method, params, cookie):
+        self.count(method)
+        if self.latency:
+            time.sleep(self.latency)
+        if self.require_login and method in LOGIN_REQUIRED and \
+           not [it for it in self.sessions
+                if "%s=%s" % (COOKIE, it) in cookie]:
+            raise xmlrpclib.Fault(1, "Anonymous access denied, please login")
+        return self._dispatch(method, params)
+
+    def forget_sessions(self):
+        self.sessions.clear()
+
+    def get_id(self, uid):
+        try:
+            id = int(uid.split(":")[-1])
+        except ValueError:
+            id = 0
+        if not 0 < id <= self.jobs + len(self.submitted):
+            raise xmlrpclib.Fault(1, "Invalid job %s" % uid)
+        return id
+
+    def login_password(self, username, password):
+        with self.lock:
+            self.set_cookie = "stub-%s-%d" % (username, self.calls)
+            self.sessions.add(self.set_cookie)
+        return username
+
+    def login_krbv(self, request):
+        return self.login_password("krbv", None)
+
+    def jobs_filter(self, filter):
+        minid = int(filter.get("minid") or 0)
+        return ["J:%d" % it for it in range(max(minid, 1), self.jobs + 1)]
+
+    def jobs_upload(self, xml):
+        ElementTree.fromstring(xml)
+        with self.lock:
+            uid = "J:%d" % (self.jobs + len(self.submitted) + 1)
+            self.submitted[uid] = xml
+        return uid
+
+    def stop(self, uid, stop_type, message):
+        self.get_id(uid)
+        self.cancelled.add(uid)
+        return True
+
+    def extend(self, recipe_id, seconds):
+        last = ((self.jobs + 1) * self.recipes) * (self.guests + 1)
+        if not 0 < recipe_id < last:
+            raise xmlrpclib.Fault(1, "Invalid recipe %s" % recipe_id)
+        return seconds
+
+    def task_info(self, uid):
+        id = self.get_id(uid)
+        return {"id": uid, "worker": None,
+                "state": "Cancelled" if uid in self.cancelled else "Completed",
+                "method": "benchmark template %d" % (id % self.templates),
+                "result": "Pass", "is_finished": True, "is_failed": False}
+
+    def to_xml(self, uid):
+        id = self.get_id(uid)
+        job = ElementTree.Element("job", id=str(id), owner="benchmark",
+                                  result="Pass", status="Completed")
+        ElementTree.SubElement(job, "whiteboard").text = \
+            "benchmark template %d" % (id % self.templates)
+        rset = ElementTree.SubElement(job, "recipeSet", id=str(id))
+        for r in range(self.recipes):
+            rid = (id * self.recipes + r) * (self.guests + 1)
+            recipe = self.__recipe(rset, "recipe", rid, r)
+            for g in range(self.guests):
+                self.__recipe(recipe, "guestrecipe", rid + g + 1, r)
+        return ElementTree.tostring(job)
+
+    def __recipe(self, parent, tag, rid, index):
+        recipe = ElementTree.SubElement(
+            parent, tag, id=str(rid), arch=("x86_64", "i386")[index % 2],
+            distro="Benchmark-7.0", system="host%d.example.com" % (rid % 50),
+            whiteboard="recipe %d" % index, status="Completed",
+            result="Pass")
+        for t in range(self.tasks):
+            task = ElementTree.SubElement(
+                recipe, "task", id=str(rid * self.tasks + t),
+                name="/benchmark/test-%d" % t, status="Completed",
+                result=RESULTS[(rid + t) % len(RESULTS)],
+                duration="00:0%d:00" % (t % 10))
+            params = ElementTree.SubElement(task, "params")
+            ElementTree.SubElement(params, "param", name="TASK_ALIAS",
+                                   value="alias-%d" % (t % 3))
+        return recipe
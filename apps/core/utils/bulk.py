@@ -0,0 +1,57 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from django.db import connection, transaction
+
+# max. number of parameters of one statement by DB (sqlite has low limit)
+MAX_PARAMS = {"sqlite": 999}
+DEFAULT_MAX_PARAMS = 30000
+
+
+def get_field(model, name):
+    """
+        Return field of model by name or attname (system or system_id)
+    """
+    for field in model._meta.fields:
+        if name in (field.name, field.attname):
+            return field
+    raise ValueError("%s has no field %s" % (model.__name__, name))
+
+
+def update_by_id(model, rows, fields):
+    """
+        Update different values of more rows by one statement:
+
+            UPDATE table SET f1 = CASE id WHEN 1 THEN .. WHEN 2 THEN .. END,
+                             f2 = CASE id ... END
+            WHERE id IN (1, 2)
+
+        `rows` is dict id -> tuple of values of `fields`. Too many rows are
+        split to more statements (MAX_PARAMS). Return number of statements.
+    """
+    if not rows:
+        return 0
+    qn = connection.ops.quote_name
+    fields = [get_field(model, it) for it in fields]
+    pk = qn(model._meta.pk.column)
+    limit = MAX_PARAMS.get(connection.vendor, DEFAULT_MAX_PARAMS)
+    size = max(limit // (2 * len(fields) + 1), 1)
+    ids = sorted(rows.keys())
+    cursor = connection.cursor()
+    for start in range(0, len(ids), size):
+        batch = ids[start:start + size]
+        columns, params = list(), list()
+        for ix, field in enumerate(fields):
+            columns.append("%s = CASE %s %s END" % (
+                qn(field.column), pk,
+                " ".join(["WHEN %s THEN %s"] * len(batch))))
+            for id in batch:
+                params.append(id)
+                params.append(field.get_db_prep_save(rows[id][ix],
+                                                     connection=connection))
+        params.extend(batch)
+        cursor.execute("UPDATE %s SET %s WHERE %s IN (%s)" % (
+            qn(model._meta.db_table), ", ".join(columns), pk,
+            ", ".join(["%s"] * len(batch))), params)
+    transaction.commit_unless_managed()
+    return (len(ids) + size - 1) // size
@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import fcntl
+import hashlib
+from datetime import datetime
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import signals
+from django.utils.timezone import utc
+from django.views.decorators.http import condition
+
+
+def get():
+    """
+        Return generation of data, it is changed every time when data
+        from beaker or waivers are saved. It costs only read of small file.
+    """
+    try:
+        with open(settings.DATA_GENERATION_FILE) as fd:
+            return int(fd.read().strip() or 0)
+    except (IOError, ValueError):
+        return 0
+
+
+def last_modified():
+    try:
+        mtime = os.stat(settings.DATA_GENERATION_FILE).st_mtime
+    except OSError:
+        return None
+    return datetime.utcfromtimestamp(int(mtime)).replace(tzinfo=utc)
+
+
+def bump():
+    """
+        Increase generation of data, it is safe for more processes.
+    """
+    with open(settings.DATA_GENERATION_FILE, "a+") as fd:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            fd.seek(0)
+            try:
+                value = int(fd.read().strip() or 0) + 1
+            except ValueError:
+                value = 1
+            fd.seek(0)
+            fd.truncate()
+            fd.write("%d\n" % value)
+            fd.flush()
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    return value
+
+
+def changed(sender, **kwargs):
+    """
+        Receiver of signals of saved and deleted objects. Data of apps in
+        DATA_GENERATION_APPS are shown on cached pages (admin, forms).
+    """
+    if not kwargs.get("action", "post_").startswith("post_"):
+        # m2m_changed is sent also before the change
+        return
+    if sender._meta.app_label in settings.DATA_GENERATION_APPS:
+        bump()
+
+
+signals.post_save.connect(changed, dispatch_uid="generation")
+signals.post_delete.connect(changed, dispatch_uid="generation")
+signals.m2m_changed.connect(changed, dispatch_uid="generation")
+
+
+def get_key(request):
+    """
+        Key of response - it depends on url, user (cookies) and generation
+        of data.
+    """
+    cookies = sorted(request.COOKIES.items())
+    return hashlib.md5(repr((get(), request.get_full_path(),
+                             cookies))).hexdigest()
+
+
+def cache_by_generation(view):
+    """
+        Decorator of views which depend only on data from DB. Response has
+        ETag and Last-Modified headers, so conditional requests are answered
+        by 304 without the view, and GET responses are kept in cache until
+        generation of data is changed.
+    """
+    @wraps(view)
+    def cached(request, *args, **kwargs):
+        if request.method != "GET":
+            return view(request, *args, **kwargs)
+        key = "generation:%s" % get_key(request)
+        response = cache.get(key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response = response.render()
+            # a page with new csrf token is not shared (cookie isn't set
+            # for other clients)
+            if response.status_code == 200 and not (
+                    request.META.get("CSRF_COOKIE_USED") and
+                    settings.CSRF_COOKIE_NAME not in request.COOKIES):
+                cache.set(key, response, settings.DATA_GENERATION_CACHE_TIMEOUT)
+        response["Vary"] = "Cookie"
+        return response
+
+    etag = lambda request, *args, **kwargs: get_key(request)
+    modified = lambda request, *args, **kwargs: last_modified()
+    return condition(etag_func=etag, last_modified_func=modified)(cached)
@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import re
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.template import Context, Template
+from django.utils.encoding import force_text
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+from apps.core.templatetags.core_extras import nostartsdate
+
+# simple variable in label rule, for example: {{arch}}, {{ whiteboard|nostartsdate }}
+SIMPLE_VARIABLE = re.compile(r"{{\s*(\w+)(\|nostartsdate)?\s*}}")
+TEMPLATE_TAG = re.compile(r"{[{%#]")
+
+
+def is_simple(rule):
+    """
+        Rule contains only text and simple variables
+    """
+    return not TEMPLATE_TAG.search(SIMPLE_VARIABLE.sub("", rule))
+
+
+class SimpleLabel(object):
+    """
+        Label rule without tags and with variables filtered only by
+        nostartsdate. It is rendered without template engine, the output
+        is the same as from Template (including autoescaping).
+    """
+
+    def __init__(self, rule):
+        self.rule = rule
+        self.parts = list()
+        pos = 0
+        for it in SIMPLE_VARIABLE.finditer(rule):
+            self.parts.append(rule[pos:it.start()])
+            self.parts.append((it.group(1), bool(it.group(2))))
+            pos = it.end()
+        self.parts.append(rule[pos:])
+        self.template = None
+
+    def render(self, data):
+        res = list()
+        for it in self.parts:
+            if not isinstance(it, tuple):
+                res.append(it)
+                continue
+            name, filtered = it
+            if name not in data:
+                # missing variable - leave it on template engine
+                return self.get_template().render(Context(data))
+            value = force_text(data[name])
+            if filtered:
+                value = nostartsdate(value)
+            res.append(conditional_escape(value))
+        # escaped html, like the output of Template
+        return mark_safe("".join(res))
+
+    def get_template(self):
+        if not self.template:
+            self.template = CompiledLabel(self.rule)
+        return self.template
+
+
+class CompiledLabel(object):
+
+    def __init__(self, rule):
+        self.template = Template("{%% load core_extras %%}%s" % rule)
+
+    def render(self, data):
+        return self.template.render(Context(data))
+
+
+class LabelCache(object):
+    """
+        Compiled label rules (JobTemplate.grouprecipes), max. `size` of the
+        last used rules are kept in memory.
+    """
+
+    def __init__(self, size=None):
+        self.size = size or settings.LABEL_CACHE_SIZE
+        self.rules = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, rule):
+        with self.lock:
+            label = self.rules.pop(rule, None)
+            if label:
+                self.rules[rule] = label
+                return label
+        if is_simple(rule):
+            label = SimpleLabel(rule)
+        else:
+            label = CompiledLabel(rule)
+        with self.lock:
+            self.rules[rule] = label
+            while len(self.rules) > self.size:
+                self.rules.popitem(last=False)
+        return label
+
+    def clear(self):
+        with self.lock:
+            self.rules.clear()
+
+
+labels = LabelCache()
+
+
+def render_lable(data, rule):
+    return labels.get(rule).render(data)
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.db.models import signals
+from apps.core.models import Arch, Distro, System, Test, Author
+
+
+def get_ids(model, field, values, defaults=None):
+    """
+        Return dict value -> id for all values, the missing rows are created.
+        It costs max. three queries, it doesn't depend on number of values.
+    """
+    values = set(values)
+    if not values:
+        return dict()
+    data = dict(model.objects.filter(**{"%s__in" % field: values})
+                             .values_list(field, "id"))
+    missing = values.difference(data)
+    if missing:
+        if callable(defaults):
+            defaults = defaults()
+        objs = list()
+        for value in missing:
+            params = dict(defaults or {})
+            params[field] = value
+            objs.append(model(**params))
+        model.objects.bulk_create(objs)
+        data.update(model.objects.filter(**{"%s__in" % field: missing})
+                                 .values_list(field, "id"))
+    return data
+
+
+class LookupCache(object):
+    """
+        Process-local cache (value -> id) of a lookup table (Arch, Distro,
+        System, Test, Author). The cache is warmed by one query, it keeps max.
+        `size` of the last used values and it is updated when an object
+        is saved or deleted in this process.
+    """
+
+    def __init__(self, model, field, defaults=None, size=None):
+        self.model = model
+        self.field = field
+        self.defaults = defaults
+        self.size = size or settings.LOOKUP_CACHE_SIZE
+        self.values = OrderedDict()
+        self.ids = dict()
+        self.lock = threading.RLock()
+        self.is_warm = False
+        signals.post_save.connect(self.__saved, sender=model, weak=False)
+        signals.post_delete.connect(self.__deleted, sender=model, weak=False)
+
+    def warm(self):
+        rows = self.model.objects.order_by("-id")\
+                                 .values_list(self.field, "id")[:self.size]
+        with self.lock:
+            self.clear()
+            for value, id in reversed(rows):
+                self.__set(value, id)
+            self.is_warm = True
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+            self.ids.clear()
+            self.is_warm = False
+
+    def get_ids(self, values, defaults=None):
+        """
+            Return dict value -> id, only missing values are loaded from
+            (or created in) DB.
+        """
+        if not self.is_warm:
+            self.warm()
+        data, missing = dict(), set()
+        with self.lock:
+            for value in set(values):
+                id = self.values.pop(value, None)
+                if id is None:
+                    missing.add(value)
+                    continue
+                # move to the end - the last used value
+                self.values[value] = id
+                data[value] = id
+        if missing:
+            loaded = get_ids(self.model, self.field, missing,
+                             defaults or self.defaults)
+            with self.lock:
+                for value, id in loaded.items():
+                    self.__set(value, id)
+            data.update(loaded)
+        return data
+
+    def get_id(self, value, defaults=None):
+        return self.get_ids([value], defaults)[value]
+
+    def __set(self, value, id):
+        self.__remove(id)
+        self.values.pop(value, None)
+        self.values[value] = id
+        self.ids[id] = value
+        while len(self.values) > self.size:
+            oval, oid = self.values.popitem(last=False)
+            self.ids.pop(oid, None)
+
+    def __remove(self, id):
+        value = self.ids.pop(id, None)
+        if value is not None and self.values.get(value) == id:
+            del self.values[value]
+
+    def __saved(self, sender, instance, **kwargs):
+        with self.lock:
+            self.__set(getattr(instance, self.field), instance.id)
+
+    def __deleted(self, sender, instance, **kwargs):
+        with self.lock:
+            self.__remove(instance.id)
+
+
+archs = LookupCache(Arch, "name")
+distros = LookupCache(Distro, "name")
+systems = LookupCache(System, "hostname")
+tests = LookupCache(Test, "name",
+                    defaults=lambda: {"owner": Author.parseAuthor("")})
+authors = LookupCache(Author, "email")
+
+
+def warm_all():
+    for cache in (archs, distros, systems, tests, authors):
+        cache.warm()
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import time
+import json
+import fcntl
+import logging
+from django.conf import settings
+
+logger = logging.getLogger('commands')
+
+
+class TokenBucket(object):
+    """
+        Token bucket limiter of requests to Beaker. State of the bucket is
+        kept in a file locked by flock, so the limit is shared by all
+        processes (commands, taskomatic workers) on the machine.
+
+        Every request waits for a token (acquire). Tokens are refilled by
+        `rate` per second up to `burst`. Errors or slow responses (report)
+        multiply the interval by backoff, successful responses decrease it.
+    """
+
+    def __init__(self, path=None, rate=None, burst=None, slow=None,
+                 max_backoff=None):
+        self.path = path or settings.BEAKER_RATE_FILE
+        self.rate = float(rate or settings.BEAKER_RATE)
+        self.burst = float(burst or settings.BEAKER_RATE_BURST)
+        self.slow = slow or settings.BEAKER_RATE_SLOW
+        self.max_backoff = max_backoff or settings.BEAKER_RATE_MAX_BACKOFF
+        self.count, self.errors, self.waited = 0, 0, 0.0
+        self.started = None
+
+    def __update(self, func):
+        """
+            Call func(state, rate) with locked state of the bucket, func
+            changes the state and its result is returned.
+        """
+        with open(self.path, "a+") as fd:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                fd.seek(0)
+                try:
+                    state = json.loads(fd.read() or "{}")
+                except ValueError:
+                    state = dict()
+                now = time.time()
+                state.setdefault("tokens", self.burst)
+                state.setdefault("time", now)
+                state.setdefault("backoff", 1.0)
+                rate = self.rate / state["backoff"]
+                state["tokens"] = min(self.burst, state["tokens"] +
+                                      max(now - state["time"], 0) * rate)
+                state["time"] = now
+                res = func(state, rate)
+                fd.seek(0)
+                fd.truncate()
+                fd.write(json.dumps(state))
+                fd.flush()
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        return res
+
+    def acquire(self):
+        """
+            Wait for a token, return time of waiting (seconds).
+        """
+        def take(state, rate):
+            if state["tokens"] >= 1:
+                state["tokens"] -= 1
+                return 0
+            return (1 - state["tokens"]) / rate
+
+        if self.started is None:
+            self.started = time.time()
+        waited = 0.0
+        while True:
+            wait = self.__update(take)
+            if not wait:
+                break
+            time.sleep(wait)
+            waited += wait
+        self.waited += waited
+        return waited
+
+    def report(self, ok, duration):
+        """
+            Report result and duration of a request to Beaker.
+        """
+        def change(state, rate):
+            if ok and duration <= self.slow:
+                state["backoff"] = max(1.0, state["backoff"] / 2)
+            else:
+                state["backoff"] = min(self.max_backoff,
+                                       state["backoff"] * 2)
+            return state["backoff"]
+
+        self.count += 1
+        if not ok:
+            self.errors += 1
+        backoff = self.__update(change)
+        if not ok or duration > self.slow:
+            logger.warning("Beaker is %s (%.1fs), rate of requests is "
+                           "decreased %dx" % ("slow" if ok else "failing",
+                                              duration, backoff))
+        return backoff
+
+    def throughput(self):
+        """
+            Achieved number of requests per hour in this process.
+        """
+        if not self.count or self.started is None:
+            return 0.0
+        return self.count * 3600.0 / max(time.time() - self.started, 1)
+
+    def summary(self):
+        return ("%d requests to Beaker (%d errors), %.0f requests/hour, "
+                "%.1fs waited for rate limit" %
+                (self.count, self.errors, self.throughput(), self.waited))
+
+
+# shared limiter of Beaker-writing requests (see Beaker.request)
+limiter = TokenBucket()
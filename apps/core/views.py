@@ -11,6 +11,7 @@ from django.db.models import Q
 from django.core.paginator import Paginator
 from django.conf import settings
 from django.core import serializers
+from django.core.cache import cache
 from django.template import Context, Template
 from django.db import connection
 
@@ -26,6 +27,7 @@ import logging
 from apps.core.models import *
 from apps.core.utils.beaker import JobGen
 from apps.core.utils.date_helpers import *
+from apps.core.utils.labels import render_lable
 from forms import JobForm, GroupsForm
 from apps.waiver.forms import WaiverForm
 from apps.waiver.models import Comment
@@ -40,14 +42,6 @@ else:
 
 logger = logging.getLogger(__name__)
 
-def render_lable(data, rule):
-    rule = "{%% load core_extras %%}%s" % rule
-    template = Template(rule)
-    context = Context(data)
-    # print "%s - %s" % ( data, rule)
-    return template.render(context)
-
-
 def import_xml(request):
     # TODO: rewrite to standard View Class
     data = {}
@@ -83,11 +77,16 @@ def to_xml(request, id):
     except JobTemplate.DoesNotExist:
         raise Http404
     xml = jg.getXML(jobT, reserve=True)
-    try:
-        soup = BeautifulSoup(xml, "xml")
-    except:
-        raise Exception("Bad xml format or something is bad")
-    xml = soup.prettify()
+    key = "%s:pretty" % jg.cache_key
+    pretty = cache.get(key)
+    if pretty is None:
+        try:
+            soup = BeautifulSoup(xml, "xml")
+        except:
+            raise Exception("Bad xml format or something is bad")
+        pretty = soup.prettify()
+        cache.set(key, pretty, settings.JOB_XML_CACHE_TIMEOUT)
+    xml = pretty
     return render(request, 'job_xml.html',
            {'template': jobT, "xml": xml, "beaker": settings.BEAKER_SERVER})
 
@@ -115,6 +114,36 @@ def statistic(request):
 
 class ApiView(View):
     content_type = 'application/json'
+    # relations used by Recipe.to_json and Job.to_json
+    RECIPE_RELATED = ("job", "job__template", "system", "system__parent",
+                      "arch", "distro", "parentrecipe",
+                      "parentrecipe__system", "parentrecipe__system__parent",
+                      "parentrecipe__arch", "parentrecipe__distro")
+    # relations used by Task.to_json
+    TASK_RELATED = ("test", "test__owner", "test__git")
+
+    def getRecipe(self, uid):
+        if uid.startswith("R:"):
+            uid = uid[2:]
+        try:
+            return Recipe.objects.select_related(*self.RECIPE_RELATED)\
+                                 .get(uid=uid)
+        except Recipe.DoesNotExist:
+            raise Http404
+
+    def getTasksComments(self, tasks, recipe=None):
+        """
+            Return comments of the tasks (task id -> list of comments) by
+            one query, the newest comments are first.
+        """
+        comments = Comment.objects.filter(task__in=[it.id for it in tasks])\
+                                  .order_by('-created_date')
+        if recipe:
+            comments = comments.filter(recipe=recipe)
+        data = dict([(it.id, []) for it in tasks])
+        for comm in comments:
+            data[comm.task_id].append(comm)
+        return data
 
     def getReschdulesOfRecipe(self, recipe):
         # Get all previous scheduled job of this job
@@ -125,7 +154,8 @@ class ApiView(View):
                                     .timetuple()[:3], hour=18, minute=55))
         rescheduled = Job.objects.filter(template=recipe.job.template,
                                          date__range=date_range)\
-                                 .exclude(id=recipe.job.id)
+                                 .exclude(id=recipe.job.id)\
+                                 .select_related("template")
         return [job.to_json() for job in rescheduled]
 
     def getRecipeComments(self, recipe):
@@ -134,19 +164,17 @@ class ApiView(View):
         return [comm.to_json() for comm in rComments]
 
     def getRecipeInfo(self, params, content):
-        uid = params.get("recipe")
-        if uid.startswith("R:"):
-            uid = uid[2:]
-        try:
-            recipe = Recipe.objects.get(uid=uid)
-        except Recipe.DoesNotExist:
-            raise Http404
+        recipe = self.getRecipe(params.get("recipe"))
 
         content['results'] = recipe.get_result()
         content['recipe'] = recipe.to_json()
         content['job'] = recipe.job.to_json()
         content['job_name'] = recipe.job.template.whiteboard
-        f2_tasks = Task.objects.filter(recipe=recipe).order_by('uid')
+        f2_tasks = list(Task.objects.filter(recipe=recipe)
+                                    .select_related(*self.TASK_RELATED)
+                                    .order_by('uid'))
+        comments = self.getTasksComments(
+            [it for it in f2_tasks if it.result in [NEW, WARN, FAIL]], recipe)
         content['task_progress'] = list()
         content['tasks'] = list()
         count = len(f2_tasks)
@@ -156,10 +184,10 @@ class ApiView(View):
         last_result = -10
         sum = 0
         for task in f2_tasks:
+            task.recipe = recipe
             if task.result in [NEW, WARN, FAIL]:
                 ecount += 1
-                tComments = Comment.objects.filter(task=task, recipe=recipe)\
-                                   .order_by('-created_date')
+                tComments = comments[task.id]
                 if len(tComments) > 0:
                     commentsCounter += 1
                 if ecount < 10:
@@ -191,37 +219,33 @@ class ApiView(View):
         content['comments'] = self.getRecipeComments(recipe)
 
     def getRecipeTasks(self, params, content):
-        uid = params.get("recipe")
+        recipe = self.getRecipe(params.get("recipe"))
         from_ix = int(params.get("from", 0))
-        if uid.startswith("R:"):
-            uid = uid[2:]
-        try:
-            recipe = Recipe.objects.get(uid=uid)
-        except Recipe.DoesNotExist:
-            raise Http404
         f_tasks = Task.objects.filter(recipe=recipe).order_by('uid')
         if params.get("filter", 'errors') == 'errors':
             f_tasks = f_tasks.filter(result__in=[NEW, WARN, FAIL])
-        f_tasks.order_by('uid')
-        content['task_len'] = len(f_tasks)
+        content['task_len'] = f_tasks.count()
         content['tasks'] = list()
-        for task in f_tasks[from_ix:from_ix + 10]:
+        tasks = list(f_tasks.select_related(*self.TASK_RELATED)
+                            [from_ix:from_ix + 10])
+        comments = self.getTasksComments(tasks, recipe)
+        for task in tasks:
+            task.recipe = recipe
             tjson = task.to_json()
-            comments = Comment.objects.filter(task=task, recipe=recipe)
-            tjson['comments'] = [comm.to_json() for comm in comments]
+            tjson['comments'] = [comm.to_json() for comm in comments[task.id]]
             content['tasks'].append(tjson)
 
     def getTaskInfo(self, params, content):
         uid = params.get("task")
-        from_ix = int(params.get("from", 0))
         if uid.startswith("T:"):
             uid = uid[2:]
-        task = None
+        related = self.TASK_RELATED + ("recipe",) + \
+                  tuple(["recipe__%s" % it for it in self.RECIPE_RELATED])
         try:
-            task = Task.objects.get(uid=uid)
-        except Recipe.DoesNotExist:
+            task = Task.objects.select_related(*related).get(uid=uid)
+        except Task.DoesNotExist:
             raise Http404
-        tComments = Comment.objects.filter(task=task).order_by('-created_date')
+        tComments = self.getTasksComments([task])[task.id]
         content['task'] = task.to_json()
         content['task']['comments'] = [comm.to_json() for comm in tComments]
         content['results'] = task.get_result()
@@ -333,17 +357,17 @@ class JobsListView(TemplateView):
             return HttpResponse(content, content_type='text/plain')
         return super(self.__class__, self).render_to_response(context, **response_kwargs)
 
-    def prepare_matrix(self, jobs, recipes, label=None):
-        data, reschedule = OrderedDict(), 0
+    def prepare_matrix(self, jobs, cells, label=None):
+        data = OrderedDict()
         if not label:
             label = create_matrix(settings.PREVIOUS_DAYS)
         for job in jobs:
             job.recipes = dict()
             data[job.whiteboard] = job
 
-        for recipe in recipes:
-            whiteboard = recipe.job.template.whiteboard
-            lb = render_lable(recipe.get_dict(), data[whiteboard].grouprecipes)
+        for cell in cells:
+            whiteboard = cell.template.whiteboard
+            lb = cell.get_label()
             tmp_recipe = data[whiteboard].recipes
             if not tmp_recipe.has_key(lb):
                 tmp_recipe[lb] = dict()
@@ -352,12 +376,11 @@ class JobsListView(TemplateView):
                 tmp_recipe[lb]["label"] = lb
                 for d in label:
                     tmp_recipe[lb]["days"][d] = {"recipe": None, "schedule": []}
-            labeldate = recipe.get_date().date()
             # recipe isn't in range of date # FIXME
-            if not tmp_recipe[lb]["days"].has_key(labeldate): continue
+            if not tmp_recipe[lb]["days"].has_key(cell.day): continue
 
-            tmp_recipe[lb]["days"][labeldate]["recipe"] = recipe
-            tmp_recipe[lb]["days"][labeldate]["schedule"].append(recipe.uid)
+            tmp_recipe[lb]["days"][cell.day]["recipe"] = cell.recipe
+            tmp_recipe[lb]["days"][cell.day]["schedule"] = cell.get_schedule()
         return data
 
     def get_context_data(self, **kwargs):
@@ -377,93 +400,59 @@ class JobsListView(TemplateView):
         context['label'] = create_matrix(settings.PREVIOUS_DAYS)
 
         jfilters = { "is_enable": True, "period": JobTemplate.DAILY}
-        date_range = (TZDatetime(*context['label'][0].timetuple()[:6]),
-                      TZDatetime(*context['label'][-1].timetuple()[:3], hour=23, minute=55)
-                     )
-        rfilters = { "job__template__is_enable": True,
-                     "job__date__range": date_range,
-                     "job__template__period": JobTemplate.DAILY}
+        cfilters = { "template__is_enable": True,
+                     "day__range": (context['label'][0], context['label'][-1]),
+                     "template__period": JobTemplate.DAILY}
 
         if self.filters.get('search'):
             jfilters["whiteboard__icontains"] = self.filters.get('search')
-            rfilters["job__template__whiteboard__icontains"] = self.filters.get('search')
+            cfilters["template__whiteboard__icontains"] = self.filters.get('search')
 
         jobs = JobTemplate.objects.filter(**jfilters).order_by("position")
-        recipes = Recipe.objects.filter(**rfilters)\
-                        .select_related("job", "job__template", "arch", "distro")\
-                        .order_by("job__template__position", "uid")\
-                        .annotate(Count('id'))
-        context['data'] = self.prepare_matrix(jobs, recipes)
+        cells = RecipeMatrix.objects.filter(**cfilters)\
+                        .select_related("template", "recipe")\
+                        .order_by("template__position", "recipe__uid")
+        context['data'] = self.prepare_matrix(jobs, cells)
 
         ### weekly ###
 
         # create label
-        cursor = connection.cursor()
-        cursor.execute("""SELECT DISTINCT date("core_job"."date") AS "date" FROM "core_job"
-                INNER JOIN "core_jobtemplate" ON ("core_job"."template_id" = "core_jobtemplate"."id")
-                WHERE ("core_jobtemplate"."is_enable" = %s AND "core_jobtemplate"."period" = %s )
-                ORDER BY date desc LIMIT %s""", [True, JobTemplate.WEEKLY, settings.PREVIOUS_DAYS, ],)
-        # sqllite return unicode
-        # postgresql return datetime
-        udate = lambda a: a.date() if type(a) in (datetime,) else a
-        context['labelweek'] = [udate(it[0]) for it in cursor.fetchall()];
-
-        #FIXME
-        try:
-            date_range = (context['labelweek'][-1], datetime.now())
-        except IndexError:
-            date_range = (datetime.now(), datetime.now())
+        context['labelweek'] = list(RecipeMatrix.objects.filter(
+                        template__is_enable=True,
+                        template__period=JobTemplate.WEEKLY)\
+                        .values_list("day", flat=True).distinct()\
+                        .order_by("-day")[:settings.PREVIOUS_DAYS])
 
         jfilters = { "is_enable": True, "period": JobTemplate.WEEKLY}
-        rfilters = { "job__template__is_enable": True,
-                     "job__date__range": date_range,
-                     "job__template__period": JobTemplate.WEEKLY}
+        cfilters = { "template__is_enable": True,
+                     "day__in": context['labelweek'],
+                     "template__period": JobTemplate.WEEKLY}
 
         if self.filters.get('search'):
             jfilters["whiteboard__icontains"] = self.filters.get('search')
-            rfilters["job__template__whiteboard__icontains"] = self.filters.get('search')
+            cfilters["template__whiteboard__icontains"] = self.filters.get('search')
 
         jobs = JobTemplate.objects.filter(**jfilters)
-        recipes = Recipe.objects.filter(**rfilters)\
-                        .select_related("job", "job__template", "arch", "distro")\
-                        .annotate(Count('id'))
-
-        ### ORM doen't work correct ###
-
-        # labelweek = [it.strftime("%Y-%m-%d") for it in Job.objects.values("date")\
-        #        .filter(
-        #             template__period=JobTemplate.WEEKLY,
-        #             template__is_enable=True,
-        #             date__lt=datetime.today().date(),
-        #         )\
-        #        .extra({'date_day': "date(date)"})\
-        #        .values("date_day").order_by("date")\
-        #        .annotate(Count('id'))\
-        #        .dates("date", "day").order_by("-date")[:settings.PREVIOUS_DAYS]] # skip today - only previous day
+        cells = RecipeMatrix.objects.filter(**cfilters)\
+                        .select_related("template", "recipe")\
+                        .order_by("recipe__uid")
         context['labelweek'].reverse()
 
-        context['dataweek'] = self.prepare_matrix(jobs, recipes, context['labelweek'])
+        context['dataweek'] = self.prepare_matrix(jobs, cells, context['labelweek'])
 
+        # statistic information
+        cfilters = { "template__is_enable": True,
+                     "day__gt": datetime.now().date() - timedelta(days=14),
+                     "template__period": JobTemplate.DAILY}
         if self.filters.get('search'):
-            # statistic information
-            cursor.execute("""SELECT date("core_job"."date") as job_date, "core_task"."result" as task_ressult, count("core_task"."result") from core_task
-               LEFT JOIN "core_recipe" ON ("core_task"."recipe_id" = "core_recipe"."id")
-               LEFT JOIN "core_job" ON ("core_recipe"."job_id" = "core_job"."id")
-               LEFT JOIN "core_jobtemplate" ON ("core_jobtemplate"."id" = "core_job"."template_id")
-               WHERE "core_job"."date" > %s AND "core_jobtemplate"."is_enable" = %s AND "core_jobtemplate"."period" = %s
-               AND lower("core_jobtemplate"."whiteboard") LIKE lower(%s)
-               GROUP BY date("core_job"."date"), "core_task"."result" ORDER BY job_date ASC, task_ressult """,
-               [(datetime.now().date() - timedelta(days=14)).isoformat(), True, JobTemplate.DAILY, "%%%s%%" % self.filters.get('search')])
-        else:
-            cursor.execute("""SELECT date("core_job"."date") as job_date, "core_task"."result" as task_ressult, count("core_task"."result") from core_task
-               LEFT JOIN "core_recipe" ON ("core_task"."recipe_id" = "core_recipe"."id")
-               LEFT JOIN "core_job" ON ("core_recipe"."job_id" = "core_job"."id")
-               LEFT JOIN "core_jobtemplate" ON ("core_jobtemplate"."id" = "core_job"."template_id")
-               WHERE "core_job"."date" > %s AND "core_jobtemplate"."is_enable" = %s AND "core_jobtemplate"."period" = %s
-               GROUP BY date("core_job"."date"), "core_task"."result" ORDER BY job_date ASC, task_ressult """,
-               [(datetime.now().date() - timedelta(days=14)).isoformat(), True, JobTemplate.DAILY])
-
-        data = cursor.fetchall()
+            cfilters["template__whiteboard__icontains"] = self.filters.get('search')
+        data = dict()
+        for day, results in RecipeMatrix.objects.filter(**cfilters)\
+                        .values_list("day", "results"):
+            cell = RecipeMatrix(results=results)
+            for result, count in cell.get_results().items():
+                data[(day, result)] = data.get((day, result), 0) + count
+        data = [(day, result, count) for (day, result), count in sorted(data.items())]
         label = OrderedDict()
         T = lambda x : dict(RESULT_CHOICES)[x]
         for it in data:
@@ -479,10 +468,7 @@ class JobsListView(TemplateView):
             context['statistic']['data'][T(it[1])][it[0]] = it[2]
             context['statistic']['data']["sum"][it[0]] += it[2]
 
-        try:
-            context['progress'] = CheckProgress.objects.order_by("-datestart")[0]
-        except IndexError:
-            context['progress'] = None
+        context['progress'] = CheckProgress.get_last()
         # Search box
         context['forms'] = self.forms.get('search', FilterForm())
         # Waive Form
@@ -552,6 +538,44 @@ class TestsListView(TemplateView):
 
         return super(self.__class__, self).render_to_response(context, **response_kwargs)
 
+    def get_page(self, tests, size, field="task_count"):
+        """
+            Keyset pagination over number of tasks (`field`), the position
+            is given by (count, id) of the last test on the previous page
+            (after) or the first test on the next page (before).
+        """
+        def position(key):
+            try:
+                count, test_id = self.request.GET.get(key, "").split("_")
+                return int(count), int(test_id)
+            except ValueError:
+                return None
+
+        after, before = position("after"), position("before")
+        if before:
+            tests = tests.filter(Q(**{"%s__gt" % field: before[0]}) |
+                                 Q(**{field: before[0],
+                                      "id__lt": before[1]}))\
+                         .order_by(field, "-id")
+        else:
+            if after:
+                tests = tests.filter(Q(**{"%s__lt" % field: after[0]}) |
+                                     Q(**{field: after[0],
+                                          "id__gt": after[1]}))
+            tests = tests.order_by("-%s" % field, "id")
+        testlist = list(tests[:size + 1])
+        more = len(testlist) > size
+        testlist = testlist[:size]
+        if before:
+            testlist.reverse()
+        key = lambda it: "%s_%s" % (getattr(it, field), it.id)
+        pages = {"previous": None, "next": None}
+        if testlist and (after or (before and more)):
+            pages["previous"] = key(testlist[0])
+        if testlist and (before or more):
+            pages["next"] = key(testlist[-1])
+        return testlist, pages
+
     def get_context_data(self, **kwargs):
         context = super(self.__class__, self).get_context_data(**kwargs)
         context['detailPanelHidden'] = self.request.COOKIES.get('detailHidden')
@@ -562,9 +586,6 @@ class TestsListView(TemplateView):
         # Tests
         testFilter = dict()
         # testFilter['task__recipe__job__template__is_enable'] = True
-        # Tasks
-        taskFilter = dict()
-        # taskFilter['recipe__job__template__is_enable'] = True
         # Owners
         owners = dict([(it.id, it) for it in Author.objects.filter(is_enabled=True).annotate(dcount=Count('test'))])
         # date Labels
@@ -615,36 +636,22 @@ class TestsListView(TemplateView):
             # taskFilter['test__owner__email'] = self.filters.get('email')
 
         if self.filters.has_key('repo_id'):
-            taskFilter['test__git__id'] = self.filters.get('repo_id')
             testFilter["git__id"] = self.filters.get('repo_id')
         if self.filters.has_key('group_id'):
-            taskFilter['test__groups__id'] = self.filters.get('group_id')
             testFilter["groups__id"] = self.filters.get('group_id')
 
-        date_range = (TZDatetime(*dates_label[0].timetuple()[:6]),
-                      TZDatetime(*dates_label[-1].timetuple()[:3], hour=23, minute=55))
-        taskFilter['recipe__job__date__range'] = date_range
-        taskFilter['test__owner__is_enabled'] = True
-
-        tasks = Task.objects.filter(**taskFilter).values(
-            "recipe__job__template__whiteboard", "test__name", "recipe__resultrate", "recipe__arch__name",
-            "test__owner__email", "recipe__uid", "recipe__job__date", "result", "id", "uid", "recipe",
-            "statusbyuser", "recipe__job__template__grouprecipes", "recipe__arch__name",
-            "recipe__whiteboard", "recipe__distro__name", "alias")\
-        .order_by("test__owner__name", "recipe__job__template__whiteboard") \
-        .annotate(Count('id'))
-
-        # tests = Test.objects.filter(**testFilter).annotate(count = Count('id')).order_by("count", "name")
         testFilter['owner__is_enabled'] = True
-        tests = Test.objects.filter(**testFilter) \
-                .annotate(count_fail=Count('task__result'))\
-                .annotate(Count('id')).order_by("-count_fail")
-
-        paginator = Paginator(tests, settings.PAGINATOR_OBJECTS_ONPAGE)
-        testlist = paginator.page(int(self.request.GET.get('page', 1)))
+        tests = Test.objects.filter(**testFilter)
+        order = "task_count"
+        if self.filters.get('onlyfail', False):
+            # tests are sorted by number of failed tasks from the last day
+            tests = tests.annotate(count_fail=Count('task__result'))
+            order = "count_fail"
+        testlist, pages = self.get_page(tests, settings.PAGINATOR_OBJECTS_ONPAGE,
+                                        order)
         ids = []
         data = dict()
-        for it in testlist.object_list:
+        for it in testlist:
             email = owners[it.owner_id].email if it.owner_id else "unknow@redhat.com"
             if not data.has_key(email):
                 data[email] = dict({"tests": OrderedDict(), 'owner': owners[it.owner_id]})
@@ -652,66 +659,44 @@ class TestsListView(TemplateView):
             it.labels = OrderedDict()
             data[email]["tests"][it.name] = it
 
-        # use only selected task
-        tasks = tasks.filter(test__in=ids)
-        stat = {"tasks": len(tasks), "tests": paginator.count}
-        for it in tasks:
-            if it['recipe__job__date'].weekday() in [4, 5]:
-                continue
-            id_email = it["test__owner__email"]
+        # use only selected tests
+        cells = TestMatrix.objects.filter(test__in=ids, day__in=dates_label)\
+                    .select_related("test", "template", "task", "task__recipe")\
+                    .order_by("template__whiteboard", "label")
+        stat = {"tasks": 0, "tests": tests.count()}
+        for cell in cells:
+            id_email = owners[cell.test.owner_id].email
             # use for filters
             if not (data.has_key(id_email) and\
-                data[id_email]["tests"].has_key(it["test__name"])):
+                data[id_email]["tests"].has_key(cell.test.name)):
                 continue
 
-            test = data[id_email]["tests"][it["test__name"]]
-            # FIXME - better solution - duplicate code in models and here
-            # print it
-            lb = render_lable({
-                "arch": it["recipe__arch__name"],
-                "distro": it["recipe__distro__name"],
-                "distro_label": it["recipe__distro__name"],
-                "whiteboard": it["recipe__whiteboard"],
-                "alias": it["alias"],
-                }, it["recipe__job__template__grouprecipes"])
-            test_label = (it["recipe__job__template__whiteboard"], lb)
+            test = data[id_email]["tests"][cell.test.name]
+            test_label = (cell.template.whiteboard, cell.get_label())
             if not test.labels.has_key(test_label):
                 test.labels[test_label] = OrderedDict()
                 for day in dates_label:
                     test.labels[test_label][day] = None
 
-            label = test.labels[test_label]
+            task = cell.task
+            task.resultrate = task.recipe.resultrate
+            task.recipe_uid = "%s" % task.recipe.uid
+            task.reschedule = len(cell.get_schedule()) - 1
+            test.labels[test_label][cell.day] = task
+            stat["tasks"] += len(cell.get_schedule())
 
-            labeldate = it["recipe__job__date"].date()
-            if not label.has_key(labeldate): continue
+        progress = CheckProgress.get_last()
 
-            reschedule = 0
-            if label[labeldate]:
-                reschedule = label[labeldate].reschedule + 1
-            label[labeldate] = Task(
-                    id=it["id"],
-                    uid=it["uid"],
-                    result=it["result"],
-                    statusbyuser=it["statusbyuser"],
-                )
-            label[labeldate].resultrate = it["recipe__resultrate"]
-            label[labeldate].recipe_uid = "%s" % it["recipe__uid"]
-            label[labeldate].reschedule = reschedule
-
-        try:
-            progress = CheckProgress.objects.order_by("-datestart")[0]
-        except IndexError:
-            progress = None
-
-        urllist = filter(lambda (x, y): x != "page", self.request.GET.copy().items())
+        urllist = filter(lambda (x, y): x not in ("after", "before"),
+                         self.request.GET.copy().items())
 
         if self.filters.get('onlyfail', False):
-            context["tests_bad"] = tests[:10]
+            context["tests_bad"] = tests.order_by("-count_fail", "id")[:10]
         context['data'] = data
         context["owners"] = owners
         context["label"] = dates_label
         context['tests'] = testlist
-        context["paginator"] = paginator
+        context["pages"] = pages
         context['progress'] = progress
         context["stat"] = stat
         context["history"] = history
@@ -728,10 +713,7 @@ class HomePageView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(self.__class__, self).get_context_data(**kwargs)
-        try:
-            context['progress'] = CheckProgress.objects.order_by("-datestart")[0]
-        except IndexError:
-            context['progress'] = None
+        context['progress'] = CheckProgress.get_last()
         # Waiver
         comments = Comment.objects\
                             .filter(created_date__gt=datetime.today().date())\
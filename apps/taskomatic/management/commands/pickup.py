@@ -6,13 +6,34 @@
 
 from django.core.management.base import BaseCommand
 from apps.taskomatic.models import Taskomatic
+from optparse import make_option
 
 
 class Command(BaseCommand):
     help = ('Automatization for running task')
     requires_model_validation = True
     can_import_settings = True
+    option_list = BaseCommand.option_list + (
+        make_option('--daemon',
+            action='store_true',
+            dest='daemon',
+            default=False,
+            help='run as resident scheduler instead of single pickup'),
+        make_option('--clean',
+            action='store_true',
+            dest='clean',
+            default=False,
+            help='only delete old tasks and report number of removed tasks'),
+        )
 
     def handle(self, *args, **kwargs):
         taskoMatic = Taskomatic()
-        taskoMatic.run()
+        if kwargs.get("clean"):
+            removed = taskoMatic.cleanOldTasks()
+            for key, count in sorted(removed.items()):
+                print "%s: %d removed" % (key, count)
+            print "total: %d removed" % sum(removed.values())
+        elif kwargs.get("daemon"):
+            taskoMatic.daemon()
+        else:
+            taskoMatic.run()
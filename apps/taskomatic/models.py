@@ -7,16 +7,23 @@
 # Email: mkorbel@redhat.com
 # Date: 20.07.2014
 
+import os
 import re
+import errno
 import sys
+import gzip
 import time
+import heapq
+import signal
+import socket
 import logging
 import inspect
 import traceback
+import multiprocessing
 from croniter import croniter
 from datetime import datetime, timedelta
 from single_process import single_process
-from django.db import models
+from django.db import models, connection
 from django.conf import settings
 # from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand, handle_default_options
@@ -73,6 +80,18 @@ class TaskPeriod(models.Model):
         return task
 
 
+def get_worker():
+    return "%s:%d" % (socket.gethostname(), os.getpid())
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
 class Task(models.Model):
     STATUS_ENUM_WAIT = 0
     STATUS_ENUM_INPROGRESS = 1
@@ -94,6 +113,8 @@ class Task(models.Model):
     date_run = TZDateTimeField(_('Date of pick up'), blank=True, null=True)
     time_long = models.FloatField(default=0.0)  # better set to NULL
     period = models.ForeignKey(TaskPeriod, blank=True, null=True)
+    # process which runs the task (hostname:pid)
+    worker = models.CharField(max_length=255, blank=True, null=True)
 
     def __unicode__(self):
         return self.title
@@ -109,10 +130,66 @@ class Task(models.Model):
             data[key] = value
         return data
 
+    def claim(self, limit=None):
+        """
+            Change status from waiting to in progress by one atomic update.
+            Return False if the task was claimed by another worker or if
+            `limit` tasks of the same command are already in progress.
+        """
+        now, worker = datetime.now(), get_worker()
+        if Task.objects.filter(id=self.id, status=self.STATUS_ENUM_WAIT)\
+                       .update(status=self.STATUS_ENUM_INPROGRESS,
+                               date_run=now, worker=worker) != 1:
+            return False
+        self.status = self.STATUS_ENUM_INPROGRESS
+        self.date_run, self.worker = now, worker
+        if limit is not None:
+            Task.releaseDead(self.common)
+            # the first claimed tasks win, tasks in progress for too long
+            # are considered as dead
+            timeout = now - timedelta(seconds=settings.TASKOMATIC_TASK_TIMEOUT)
+            running = Task.objects.filter(common=self.common,
+                                          status=self.STATUS_ENUM_INPROGRESS,
+                                          date_run__gt=timeout)\
+                                  .order_by("date_run", "id")\
+                                  .values_list("id", flat=True)[:limit]
+            if self.id not in list(running):
+                Task.objects.filter(id=self.id)\
+                            .update(status=self.STATUS_ENUM_WAIT,
+                                    date_run=None, worker=None)
+                self.status = self.STATUS_ENUM_WAIT
+                self.date_run, self.worker = None, None
+                return False
+        return True
+
+    @staticmethod
+    def releaseDead(common=None):
+        """
+            Tasks in progress, whose worker process on this host doesn't
+            exist anymore, are finished with error, so they don't block
+            other tasks of the same command. Return number of the tasks.
+        """
+        host = "%s:" % socket.gethostname()
+        tasks = Task.objects.filter(status=Task.STATUS_ENUM_INPROGRESS,
+                                    worker__startswith=host)
+        if common:
+            tasks = tasks.filter(common=common)
+        dead = [task_id for task_id, worker in
+                tasks.values_list("id", "worker")
+                if not is_running(int(worker[len(host):]))]
+        if not dead:
+            return 0
+        logger.error("Workers of tasks %s died" % dead)
+        return Task.objects.filter(id__in=dead,
+                                   status=Task.STATUS_ENUM_INPROGRESS)\
+                           .update(status=Task.STATUS_ENUM_ERROR,
+                                   exit_result="Worker process died")
+
     def run(self, hook, errorHandler=None):
         t1 = datetime.now()
-        self.status = self.STATUS_ENUM_INPROGRESS  # set status "in progress"
-        self.save()
+        if self.status != self.STATUS_ENUM_INPROGRESS:
+            self.status = self.STATUS_ENUM_INPROGRESS  # set status "in progress"
+            self.save()
 
         # --- RUN --- #
         if errorHandler:
@@ -195,27 +272,221 @@ class Taskomatic:
                 period.date_last = datetime.now()
                 period.save()
 
-    def __checkTasks(self):
-        tasks = Task.objects.filter(status=Task.STATUS_ENUM_WAIT)
+    def __claimTask(self):
+        """
+            Claim the oldest waiting task, which is allowed by concurrency
+            limits of commands (settings.TASKOMATIC_CONCURRENCY).
+        """
+        limits = settings.TASKOMATIC_CONCURRENCY
+        for task in Task.objects.filter(status=Task.STATUS_ENUM_WAIT)\
+                                .order_by("id"):
+            if task.common not in self.hooks:
+                print "operation '%s' is not supported" % task.common
+                continue
+            if task.claim(limits.get(task.common)):
+                return task
+        return None
+
+    def __setLogHandler(self):
         self.logHandler = Taskomatic.ListBufferingHandler(0)
         self.logHandler.setLevel(logging.INFO)
         logger.addHandler(self.logHandler)
-        for task in tasks:
-            if task.common in self.hooks:
-                task.run(self.hooks[task.common], self.logHandler)
-            else:
-                print "operation '%s' is not supported" % task.common
 
-    def __cleanOldTasks(self):
-        # delete old tasks with status DONE, keep only last 300 tasks
-        [it.delete() for it in Task.objects\
-            .filter(status=Task.STATUS_ENUM_DONE).order_by("-date_run")[300:]]
+    def __worker(self, busy=None, forever=False):
+        """
+            Run waiting tasks until there is nothing to do. With more
+            workers, an idle worker waits for new tasks while another
+            worker still runs a task. The worker of daemon never ends,
+            it polls DB with backoff.
+        """
+        self.__setLogHandler()
+        interval = settings.TASKOMATIC_POLL_INTERVAL
+        while True:
+            task = self.__claimTask()
+            if task:
+                if busy is not None:
+                    with busy.get_lock():
+                        busy.value += 1
+                try:
+                    task.run(self.hooks[task.common], self.logHandler)
+                finally:
+                    if busy is not None:
+                        with busy.get_lock():
+                            busy.value -= 1
+                interval = settings.TASKOMATIC_POLL_INTERVAL
+                continue
+            if not forever and (busy is None or busy.value == 0):
+                break
+            time.sleep(interval)
+            if forever:
+                interval = min(interval * 2,
+                               settings.TASKOMATIC_POLL_MAX_INTERVAL)
+
+    def __schedulePeriods(self):
+        """
+            Return heap of (time of next run, period) for enabled periods
+        """
+        schedule = list()
+        for period in TaskPeriod.objects.filter(is_enable=True):
+            if not period.date_last:
+                period.date_last = datetime.now()
+                period.save()
+            citer = croniter(period.cron, toLocalZone(period.date_last))
+            heapq.heappush(schedule, (citer.get_next(), period.id, period))
+        return schedule
+
+    def startWorker(self):
+        """
+            Start worker of daemon in a new process. It is not daemonic
+            process, because tasks (checkrepo) run own pools of processes,
+            the daemon terminates and joins its workers itself.
+        """
+        process = multiprocessing.Process(target=self.__worker,
+                                          kwargs={"forever": True})
+        process.start()
+        return process
+
+    @single_process
+    def daemon(self):
+        """
+            Resident scheduler: hooks are loaded once, workers wait for new
+            tasks and periods are run at their time from priority queue.
+            Changes of periods are checked every TASKOMATIC_DAEMON_TICK
+            seconds.
+        """
+        def terminate(signum, frame):
+            raise SystemExit(0)
+        signal.signal(signal.SIGTERM, terminate)
+
+        self.getHooks()
+        connection.close()
+        workers = [self.startWorker()
+                   for it in range(max(settings.TASKOMATIC_WORKERS, 1))]
+        signature, schedule, last_clean = None, [], 0
+        try:
+            while True:
+                # the periods were changed (admin), compute a new schedule
+                actual = list(TaskPeriod.objects.filter(is_enable=True)
+                              .values_list("id", "cron").order_by("id"))
+                if actual != signature:
+                    signature, schedule = actual, self.__schedulePeriods()
+                while schedule and schedule[0][0] <= time.time():
+                    next_date, period_id, period = heapq.heappop(schedule)
+                    logger.info("Run period %s" % period.title)
+                    period.createTask()
+                    period.date_last = datetime.now()
+                    period.save()
+                    citer = croniter(period.cron, toLocalZone(period.date_last))
+                    heapq.heappush(schedule, (citer.get_next(), period_id,
+                                              period))
+                if time.time() - last_clean > settings.TASKOMATIC_CLEAN_INTERVAL:
+                    self.cleanOldTasks()
+                    last_clean = time.time()
+                # restart dead workers
+                for ix, process in enumerate(workers):
+                    if not process.is_alive():
+                        logger.error("Worker %s died with exit code %s"
+                                     % (process.pid, process.exitcode))
+                        connection.close()
+                        workers[ix] = self.startWorker()
+                # tasks of dead workers don't block other tasks
+                Task.releaseDead()
+                timeout = settings.TASKOMATIC_DAEMON_TICK
+                if schedule:
+                    timeout = min(timeout, schedule[0][0] - time.time())
+                time.sleep(max(timeout, 0))
+        finally:
+            # workers are not daemonic, they have to be stopped here
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()
+            for process in workers:
+                process.join()
+
+    def __checkTasks(self):
+        workers = settings.TASKOMATIC_WORKERS
+        if workers <= 1:
+            self.__worker()
+            return
+        # every process has to open own connection to DB
+        connection.close()
+        busy = multiprocessing.Value("i", 0)
+        processes = [multiprocessing.Process(target=self.__worker,
+                                             args=(busy, ))
+                     for it in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    def __archiveTasks(self, rows):
+        """
+            Append logs of deleted tasks to compressed file in
+            TASKOMATIC_ARCHIVE_DIR (one file per day).
+        """
+        if not settings.TASKOMATIC_ARCHIVE_DIR:
+            return
+        if not os.path.isdir(settings.TASKOMATIC_ARCHIVE_DIR):
+            os.makedirs(settings.TASKOMATIC_ARCHIVE_DIR)
+        path = os.path.join(settings.TASKOMATIC_ARCHIVE_DIR, "tasks-%s.log.gz"
+                            % datetime.now().strftime("%Y%m%d"))
+        with gzip.open(path, "ab") as fd:
+            for task_id, title, common, params, date_run, exit_result in rows:
+                fd.write((u"=== %s %s: %s %s (%s)\n%s\n" % (
+                          task_id, title, common, params, date_run,
+                          exit_result or "")).encode("utf-8"))
+
+    def cleanOldTasks(self):
+        """
+            Delete old finished tasks, number of kept tasks is set by status
+            (TASKOMATIC_KEEP) and by command (TASKOMATIC_KEEP_COMMANDS).
+            Tasks are deleted in batches by one query, their logs are
+            archived before. Return number of removed tasks by rule.
+        """
+        statuses = dict([(name.lower(), status)
+                         for status, name in Task.STATUS_ENUM])
+        rules = list()
+        for status, keep in settings.TASKOMATIC_KEEP.items():
+            rules.append((status, None, keep))
+        for command, keeps in settings.TASKOMATIC_KEEP_COMMANDS.items():
+            for status, keep in keeps.items():
+                rules.append((status, command, keep))
+        removed = dict()
+        for status, command, keep in rules:
+            tasks = Task.objects.filter(status=statuses[status])
+            if command:
+                tasks = tasks.filter(common=command)
+            else:
+                # commands with own rule for this status
+                tasks = tasks.exclude(common__in=[
+                    it for it, keeps in
+                    settings.TASKOMATIC_KEEP_COMMANDS.items()
+                    if status in keeps])
+            key = "%s %s" % (status, command or "*")
+            removed[key] = 0
+            while True:
+                rows = list(tasks.order_by("-date_run", "-id")
+                                 .values_list("id", "title", "common",
+                                              "common_params", "date_run",
+                                              "exit_result")
+                                 [keep:keep + settings.TASKOMATIC_CLEAN_BATCH])
+                if not rows:
+                    break
+                self.__archiveTasks(rows)
+                Task.objects.filter(id__in=[it[0] for it in rows]).delete()
+                removed[key] += len(rows)
+                if len(rows) < settings.TASKOMATIC_CLEAN_BATCH:
+                    break
+            if removed[key]:
+                logger.info("Removed %d old tasks (status %s, command %s)" %
+                            (removed[key], status, command or "*"))
+        return removed
 
     @single_process
     def run(self):
         self.getHooks()
         self.__checkTaskPeriods()
         self.__checkTasks()
-        self.__cleanOldTasks()
+        self.cleanOldTasks()
 
 
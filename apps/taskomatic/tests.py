@@ -14,3 +14,187 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+from datetime import datetime
+from apps.taskomatic.models import Task
+
+
+class TaskClaimTest(TestCase):
+
+    def test_claim_once(self):
+        task = Task.objects.create(title="check", common="check")
+        self.assertTrue(task.claim())
+        other = Task.objects.get(id=task.id)
+        other.status = Task.STATUS_ENUM_WAIT
+        self.assertFalse(other.claim())
+        self.assertEqual(Task.objects.get(id=task.id).status,
+                         Task.STATUS_ENUM_INPROGRESS)
+
+    def test_claim_limit(self):
+        first = Task.objects.create(title="check", common="check")
+        second = Task.objects.create(title="check", common="check")
+        beaker = Task.objects.create(title="beaker", common="beaker")
+        self.assertTrue(first.claim(1))
+        self.assertFalse(second.claim(1))
+        self.assertEqual(Task.objects.get(id=second.id).status,
+                         Task.STATUS_ENUM_WAIT)
+        self.assertTrue(beaker.claim())
+
+    def test_claim_dead_worker(self):
+        import socket
+        import subprocess
+        # pid of finished process
+        process = subprocess.Popen(["true"])
+        process.wait()
+        dead = Task.objects.create(title="check", common="check",
+                                   status=Task.STATUS_ENUM_INPROGRESS,
+                                   date_run=datetime.now(),
+                                   worker="%s:%d" % (socket.gethostname(),
+                                                     process.pid))
+        task = Task.objects.create(title="check", common="check")
+        self.assertTrue(task.claim(1))
+        self.assertEqual(Task.objects.get(id=dead.id).status,
+                         Task.STATUS_ENUM_ERROR)
+        self.assertEqual(Task.objects.get(id=task.id).worker,
+                         "%s:%d" % (socket.gethostname(), os.getpid()))
+
+
+import os
+import gzip
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from django.test.utils import override_settings
+from apps.taskomatic.models import Taskomatic
+
+
+class CleanOldTasksTest(TestCase):
+
+    def setUp(self):
+        self.archive = tempfile.mkdtemp()
+        now = datetime.now()
+        for ix in range(5):
+            Task.objects.create(title="check", common="check",
+                                status=Task.STATUS_ENUM_DONE,
+                                date_run=now - timedelta(hours=ix),
+                                exit_result="log %s" % ix)
+        Task.objects.create(title="beaker", common="beaker",
+                            status=Task.STATUS_ENUM_DONE, date_run=now)
+
+    def tearDown(self):
+        shutil.rmtree(self.archive)
+
+    def test_clean(self):
+        with override_settings(TASKOMATIC_KEEP={"done": 1},
+                               TASKOMATIC_KEEP_COMMANDS={"check": {"done": 2}},
+                               TASKOMATIC_CLEAN_BATCH=2,
+                               TASKOMATIC_ARCHIVE_DIR=self.archive):
+            removed = Taskomatic().cleanOldTasks()
+        self.assertEqual(removed, {"done *": 0, "done check": 3})
+        self.assertEqual(Task.objects.filter(common="check").count(), 2)
+        self.assertEqual(Task.objects.filter(common="beaker").count(), 1)
+        self.assertEqual(len(os.listdir(self.archive)), 1)
+
+    def test_archive_unicode(self):
+        Task.objects.create(title=u"\u010cesk\xfd", common="beaker",
+                            status=Task.STATUS_ENUM_DONE,
+                            date_run=datetime.now() - timedelta(days=1),
+                            exit_result=u"chyba: \u017elu\u0165ou\u010dk\xfd")
+        with override_settings(TASKOMATIC_KEEP={"done": 1},
+                               TASKOMATIC_KEEP_COMMANDS={},
+                               TASKOMATIC_ARCHIVE_DIR=self.archive):
+            removed = Taskomatic().cleanOldTasks()
+        self.assertEqual(removed, {"done *": 6})
+        path = os.path.join(self.archive, os.listdir(self.archive)[0])
+        with gzip.open(path) as fd:
+            content = fd.read().decode("utf-8")
+        self.assertTrue(u"\u010cesk\xfd: beaker" in content)
+        self.assertTrue(u"chyba: \u017elu\u0165ou\u010dk\xfd" in content)
+
+
+import time
+import multiprocessing
+from django.db import connection
+from django.test import TransactionTestCase
+from django.core.management.base import BaseCommand
+
+POOL_RESULT = tempfile.mktemp(prefix="taskomatic-pool-")
+
+
+class PoolCommand(BaseCommand):
+    """
+        Command which runs own pool of processes (like checkrepo)
+    """
+
+    def handle(self, *args, **kwargs):
+        pool = multiprocessing.Pool(2)
+        try:
+            result = pool.map(abs, [-1, -2])
+        finally:
+            pool.close()
+            pool.join()
+        with open(POOL_RESULT + ".tmp", "w") as fd:
+            fd.write(repr(result))
+        os.rename(POOL_RESULT + ".tmp", POOL_RESULT)
+
+
+class DaemonWorkerTest(TransactionTestCase):
+
+    def tearDown(self):
+        if os.path.exists(POOL_RESULT):
+            os.remove(POOL_RESULT)
+
+    def test_worker_runs_pool(self):
+        Task.objects.create(title="pool", common="pool")
+        taskomatic = Taskomatic()
+        taskomatic.hooks = {"pool": PoolCommand}
+        # the worker opens own connection to DB, like workers of daemon
+        connection.close()
+        with override_settings(TASKOMATIC_CONCURRENCY={}):
+            process = taskomatic.startWorker()
+        try:
+            for it in range(300):
+                if os.path.exists(POOL_RESULT):
+                    break
+                time.sleep(0.1)
+        finally:
+            process.terminate()
+            process.join()
+        self.assertFalse(process.daemon)
+        with open(POOL_RESULT) as fd:
+            self.assertEqual(fd.read(), "[1, 2]")
+
+
+WORKER_RESULTS = tempfile.mktemp(prefix="taskomatic-workers-")
+
+
+class TouchCommand(BaseCommand):
+    """
+        Command which leaves a file named by its argument and pid
+    """
+
+    def handle(self, *args, **kwargs):
+        open(os.path.join(WORKER_RESULTS, "%s-%d" % (args[0], os.getpid())),
+             "w").close()
+
+
+class MultiWorkerTest(TransactionTestCase):
+
+    def setUp(self):
+        os.mkdir(WORKER_RESULTS)
+
+    def tearDown(self):
+        shutil.rmtree(WORKER_RESULTS)
+
+    def test_workers_run_tasks(self):
+        for it in range(4):
+            Task.objects.create(title="touch", common="touch",
+                                common_params="task%d" % it)
+        taskomatic = Taskomatic()
+        taskomatic.hooks = {"touch": TouchCommand}
+        with override_settings(TASKOMATIC_WORKERS=2,
+                               TASKOMATIC_CONCURRENCY={}):
+            taskomatic._Taskomatic__checkTasks()
+        names = set([it.split("-")[0] for it in os.listdir(WORKER_RESULTS)])
+        self.assertEqual(names, set(["task0", "task1", "task2", "task3"]))
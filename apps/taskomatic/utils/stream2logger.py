@@ -14,3 +14,8 @@ class StreamToLogger(object):
     def write(self, buf):
         for line in buf.rstrip().splitlines():
             self.logger.log(self.log_level, line.rstrip())
+
+    def flush(self):
+        # the lines are passed to logger immediately, multiprocessing
+        # flushes sys.stderr before fork
+        pass
@@ -1,9 +1,12 @@
 
 from django import forms
+from django.db import transaction
 from django.utils.translation import ugettext_lazy as _
 from apps.waiver.models import Comment
-from apps.core.models import Job, Task, Recipe, Author
+from apps.core.models import Job, Task, Recipe, Author, WAIVED
+from apps.core.utils.date_helpers import currentDate2
 from apps.taskomatic.models import Task as TaskomaticTask
+from apps.core.utils import generation
 
 
 class WaiverForm(forms.ModelForm):
@@ -17,14 +20,30 @@ class WaiverForm(forms.ModelForm):
     def clean_uids(self):
         uids = self.cleaned_data["uids"].split(" ")
         # print uids
+        jobs = [uid for uid in uids if uid.startswith("J:")]
+        recipes = [uid[2:] for uid in uids if uid.startswith("R:")]
+        tasks = [uid[2:] for uid in uids if uid.startswith("T:")]
+        # one query for every type of uids
+        objs = dict()
+        if jobs:
+            objs.update([(it.uid, it) for it in
+                         Job.objects.filter(uid__in=jobs)])
+        if recipes:
+            objs.update([("R:%s" % it.uid, it) for it in
+                         Recipe.objects.filter(uid__in=recipes)
+                                       .select_related("job")])
+        if tasks:
+            objs.update([("T:%s" % it.uid, it) for it in
+                         Task.objects.filter(uid__in=tasks)
+                                     .select_related("recipe", "recipe__job")])
         uid_list = []
         for uid in uids:
-            if uid.startswith("R:"):
-                uid_list.append(Recipe.objects.get(uid=uid[2:]))
-            if uid.startswith("J:"):
-                uid_list.append(Job.objects.get(uid=uid))
-            if uid.startswith("T:"):
-                uid_list.append(Task.objects.get(uid=uid[2:]))
+            if uid[:2] not in ("J:", "R:", "T:"):
+                continue
+            if uid not in objs:
+                raise forms.ValidationError(_(u'Unknown beaker\'s unique id '
+                                               '%s') % uid)
+            uid_list.append(objs[uid])
         if not uid_list:
             raise forms.ValidationError(_(u'You must fill beaker\'s unique id '
                                            'of task, recipe or jobs'))
@@ -51,53 +70,92 @@ class WaiverForm(forms.ModelForm):
         return mes.replace("'", "\\'")
 
     def save(self):
-        for it in self.cleaned_data["uids"]:
-            data = {
-                    "content": self.__esc(self.cleaned_data.get("content",
-                                                                "")),
-                    "username": self.cleaned_data["username"],
-                    "action": self.cleaned_data["action"],
-            }
-            data["recipe"] = it if type(it) == Recipe else None
-            data["job"] = it if type(it) == Job else None
-            if type(it) == Task:
-                data["task"] = it
-                data["recipe"] = it.recipe
-            else:
-                data["task"] = None
-            # print data
-            oComment = Comment(**data)
-            oComment.save()
+        """
+            Save comments of all uids by one query, the waived tasks and
+            recipes are updated in bulk and every affected recipe is
+            recounted only once.
+        """
+        comments = list()
+        waived_tasks, waived_recipes = dict(), dict()
+        with transaction.commit_on_success():
+            for it in self.cleaned_data["uids"]:
+                data = {
+                        "content": self.__esc(self.cleaned_data.get("content",
+                                                                    "")),
+                        "username": self.cleaned_data["username"],
+                        "action": self.cleaned_data["action"],
+                }
+                data["recipe"] = it if type(it) == Recipe else None
+                data["job"] = it if type(it) == Job else None
+                if type(it) == Task:
+                    data["task"] = it
+                    data["recipe"] = it.recipe
+                else:
+                    data["task"] = None
+                # print data
+                # created_date is set here, default value of the field is
+                # set by last restart of application
+                oComment = Comment(created_date=currentDate2(), **data)
+                comments.append(oComment)
 
-            # FIXME workaround: date is set by last restart application
-            # we don't know why
-            oComment.set_time()
-
-            if data["action"] == Comment.ENUM_ACTION_RETURN and\
-               type(it) == Recipe:
-                task = TaskomaticTask(title="WebUI: beaker return2beaker",
-                                      common="beaker")
-                task.common_params = "beaker return2beaker "\
-                                    "--return2beaker-recipe='R:%(recipe)s' "\
-                                    "--reschedule-message='%(content)s'" % \
-                                     data
-                task.save()
-            if data["action"] == Comment.ENUM_ACTION_RESCHEDULE:
-                task = TaskomaticTask(title="WebUI: beaker reschedule",
+                if data["action"] == Comment.ENUM_ACTION_RETURN and\
+                   type(it) == Recipe:
+                    task = TaskomaticTask(title="WebUI: beaker return2beaker",
                                           common="beaker")
-                uid = None
-                if type(it) == Recipe:
-                    uid = data["recipe"].job.uid
-                elif type(it) == Job:
-                    uid = data["job"].uid
-                task.common_params = "beaker reschedule "\
-                                     "--reschedule-job='%s' "\
-                                     "--reschedule-message='%s'" % \
-                                    (uid, self.__esc(self.cleaned_data
-                                                     .get("content", "")))
-                task.save()
-            if oComment.is_waived() and oComment.recipe and not data["task"]:
-                oComment.recipe.set_waived()
-            elif oComment.is_waived() and oComment.task:
-                oComment.task.set_waived()
+                    task.common_params = "beaker return2beaker "\
+                                        "--return2beaker-recipe='R:%(recipe)s' "\
+                                        "--reschedule-message='%(content)s'" % \
+                                         data
+                    task.save()
+                if data["action"] == Comment.ENUM_ACTION_RESCHEDULE:
+                    task = TaskomaticTask(title="WebUI: beaker reschedule",
+                                              common="beaker")
+                    uid = None
+                    if type(it) == Recipe:
+                        uid = data["recipe"].job.uid
+                    elif type(it) == Job:
+                        uid = data["job"].uid
+                    task.common_params = "beaker reschedule "\
+                                         "--reschedule-job='%s' "\
+                                         "--reschedule-message='%s'" % \
+                                        (uid, self.__esc(self.cleaned_data
+                                                         .get("content", "")))
+                    task.save()
+                if oComment.is_waived() and oComment.recipe and not data["task"]:
+                    waived_recipes[oComment.recipe.id] = oComment.recipe
+                elif oComment.is_waived() and oComment.task:
+                    waived_tasks[oComment.task.id] = oComment.task
+
+            Comment.objects.bulk_create(comments)
+            if waived_recipes:
+                Recipe.objects.filter(id__in=waived_recipes.keys())\
+                              .update(statusbyuser=WAIVED)
+                for recipe in waived_recipes.values():
+                    recipe.statusbyuser = WAIVED
+            if waived_tasks:
+                Task.objects.filter(id__in=waived_tasks.keys())\
+                            .update(statusbyuser=WAIVED)
+                recount_recipes(dict([(it.recipe.id, it.recipe)
+                                      for it in waived_tasks.values()]),
+                                waived_recipes)
+        generation.bump()
+
 
+def recount_recipes(recipes, waived_recipes):
+    """
+        Recount results of the recipes (id -> recipe) from their tasks
+        loaded by one query.
+    """
+    tasks = dict([(it, []) for it in recipes])
+    for recipe_id, result, statusbyuser, test_name in Task.objects\
+            .filter(recipe__in=recipes.keys()).order_by("recipe", "uid")\
+            .values_list("recipe", "result", "statusbyuser", "test__name"):
+        tasks[recipe_id].append((result, statusbyuser, test_name))
+    for recipe_id, recipe in recipes.items():
+        if recipe_id in waived_recipes:
+            recipe.statusbyuser = WAIVED
+        recipe.recount_result(tasks[recipe_id])
+        Recipe.objects.filter(id=recipe_id)\
+                      .update(result=recipe.result,
+                              resultrate=recipe.resultrate,
+                              statusbyuser=recipe.statusbyuser)
@@ -14,3 +14,55 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+from apps.core.models import Author, Test, Arch, Distro, System, JobTemplate
+from apps.core.models import Job, Recipe, Task, FAIL, PASS, WAIVED
+from apps.waiver.forms import WaiverForm
+from apps.waiver.models import Comment
+
+
+class WaiverFormTest(TestCase):
+
+    def setUp(self):
+        template = JobTemplate.objects.create(whiteboard="Daily")
+        job = Job.objects.create(template=template, uid="J:1")
+        system = System.objects.create(hostname="host")
+        arch = Arch.objects.create(name="x86_64")
+        distro = Distro.objects.create(name="RHEL-7")
+        owner = Author.objects.create(name="Owner", email="owner@example.com")
+        self.recipes = list()
+        uid = 0
+        for ix in range(2):
+            recipe = Recipe.objects.create(job=job, uid="%s" % ix,
+                                           whiteboard="recipe", system=system,
+                                           arch=arch, distro=distro,
+                                           result=FAIL)
+            for it in range(10):
+                uid += 1
+                test = Test.objects.create(name="/test/%s" % uid, owner=owner)
+                Task.objects.create(uid="%s" % uid, test=test, recipe=recipe,
+                                    result=FAIL if it < 5 else PASS)
+            self.recipes.append(recipe)
+
+    def test_bulk_waive(self):
+        uids = ["T:%s" % it.uid for it in Task.objects.filter(result=FAIL)]
+        form = WaiverForm({"uids": " ".join(uids), "username": "owner",
+                           "content": "known issue",
+                           "action": Comment.ENUM_ACTION_WAIVED})
+        self.assertTrue(form.is_valid())
+        # comments, tasks, tasks of recipes, one update for each recipe
+        with self.assertNumQueries(5):
+            form.save()
+        self.assertEqual(Comment.objects.filter(task__isnull=False).count(),
+                         10)
+        self.assertEqual(Task.objects.filter(statusbyuser=WAIVED).count(), 10)
+        for recipe in Recipe.objects.all():
+            self.assertEqual(recipe.result, PASS)
+            self.assertEqual(recipe.resultrate, 100.)
+
+    def test_unknown_uid(self):
+        form = WaiverForm({"uids": "T:1 T:999", "username": "owner",
+                           "content": "", "action": Comment.ENUM_ACTION_NONE})
+        self.assertFalse(form.is_valid())
+        self.assertIn("uids", form.errors)
@@ -125,6 +125,47 @@ TASKOMATIC_HOOKS = (
     'apps.core.management.commands',
 )
 
+# number of processes, which run waiting tasks of taskomatic in parallel
+TASKOMATIC_WORKERS = 4
+
+# max. number of running tasks of the command (other commands are limited
+# only by number of workers)
+TASKOMATIC_CONCURRENCY = {
+    'check': 1,
+    'checkrepo': 1,
+}
+
+# task in progress longer than this (seconds) doesn't block other tasks
+# of the same command (its process is probably dead), tasks of dead
+# workers on the same host are released immediately
+TASKOMATIC_TASK_TIMEOUT = 2 * 60 * 60
+
+# idle worker checks new tasks every N seconds while other workers run,
+# workers of daemon (pickup --daemon) prolong the interval up to
+# TASKOMATIC_POLL_MAX_INTERVAL when there are no tasks
+TASKOMATIC_POLL_INTERVAL = 1
+TASKOMATIC_POLL_MAX_INTERVAL = 15
+
+# daemon checks changes of periods every N seconds
+TASKOMATIC_DAEMON_TICK = 60
+
+# daemon deletes old tasks every N seconds
+TASKOMATIC_CLEAN_INTERVAL = 60 * 60
+
+# number of kept finished tasks of taskomatic by status ("done", "error")
+# and the same by command, older tasks are deleted in batches
+TASKOMATIC_KEEP = {
+    'done': 300,
+    'error': 1000,
+}
+TASKOMATIC_KEEP_COMMANDS = {
+    # 'check': {'done': 100},
+}
+TASKOMATIC_CLEAN_BATCH = 500
+
+# logs of deleted tasks are archived here (None - without archive)
+TASKOMATIC_ARCHIVE_DIR = ROOT_PATH + '/archive/taskomatic'
+
 ROOT_URLCONF = 'tttt.urls'
 
 # Python dotted path to the WSGI application used by Django's runserver.
@@ -248,6 +289,13 @@ BEAKER_SERVER = "https://beaker.example.com"
 # Set BEAKER_OWNER and BEAKER_PASS or you can use kerberos auth
 BEAKER_OWNER = None
 BEAKER_PASS = None
+# kerberos auth (python-krbV) uses ticket from default credential cache
+# (kinit), principal of beaker is <service>/<hostname>@<realm>, the default
+# realm is used by default
+BEAKER_KRB_SERVICE = "HTTP"
+BEAKER_KRB_REALM = None
+# class of XML-RPC client of Beaker (one session per thread)
+BEAKER_CLIENT = "apps.core.utils.beaker_client.BeakerClient"
 
 BEAKER_DEFAULT_PACKAGES = (
     "vim", "gcc", "make", "nfs-utils", "wget", "libxml2-python",
@@ -271,6 +319,45 @@ PAGINATOR_OBJECTS_ONHOMEPAGE = 10
 PREVIOUS_DAYS = 9
 CHECK_COMMMITS_PREVIOUS_DAYS = 7
 
+# number of processes which refresh git repositories (checkrepo)
+CHECKREPO_WORKERS = 4
+
+# number of parallel connections to beaker used by `manage.py check`
+CHECK_WORKERS = 4
+
+# max. number of names (archs, distros, systems, tests) cached in memory
+# per table during import of data from beaker
+LOOKUP_CACHE_SIZE = 5000
+
+# max. number of compiled label rules (JobTemplate.grouprecipes) in memory
+LABEL_CACHE_SIZE = 256
+
+# progress of `manage.py check` is saved every N jobs or N seconds
+CHECK_PROGRESS_FLUSH_JOBS = 50
+CHECK_PROGRESS_FLUSH_SECONDS = 10
+# web pages read the progress from cache (seconds)
+CHECK_PROGRESS_CACHE_TIMEOUT = 30
+
+# generation of data (changed by check and waivers), it is used for ETag
+# of pages and api, responses are cached until the generation is changed
+DATA_GENERATION_FILE = ROOT_PATH + '/data.generation'
+DATA_GENERATION_CACHE_TIMEOUT = 60 * 60
+# every change of models of these apps changes the generation
+DATA_GENERATION_APPS = ("core", "waiver", "taggit")
+
+# generated job xml (JobGen) is cached by hash of the template tree,
+# archs for today and reserve flag (seconds)
+JOB_XML_CACHE_TIMEOUT = 24 * 60 * 60
+
+# limit of requests to Beaker (submit, cancel) shared by all processes,
+# tokens per second and max. number of tokens in the bucket
+BEAKER_RATE = 0.5
+BEAKER_RATE_BURST = 5
+BEAKER_RATE_FILE = ROOT_PATH + '/beaker.rate'
+# slower responses (seconds) or errors decrease the rate, max. 16x
+BEAKER_RATE_SLOW = 10
+BEAKER_RATE_MAX_BACKOFF = 16
+
 
 GRAPPELLI_ADMIN_TITLE = "<a href='/' >Green Tea</a>"
 
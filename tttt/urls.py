@@ -3,6 +3,7 @@ from django.conf import settings
 from django.contrib import admin
 from apps.core.views import *
 from apps.kerberos.views import *
+from apps.core.utils.generation import cache_by_generation
 import apps.api.urls
 admin.autodiscover()
 
@@ -12,12 +13,12 @@ urlpatterns = patterns('',
     url(r'^import/group$', 'apps.core.views.import_group', name='import-group'),
     url(r'^api/', include(apps.api.urls)),
 #   url(r'^api-auth/', include('rest_framework.urls', namespace='rest_framework')),
-    url(r'^tests/(?P<email>.+)$', TestsListView.as_view(), name='tests-email'),
+    url(r'^tests/(?P<email>.+)$', cache_by_generation(TestsListView.as_view()), name='tests-email'),
     url(r'^accounts/login', LoginView.as_view(), name="login"),
     url(r'^job/(?P<id>[0-9]+)$', JobDetailView.as_view(), name='job-detail'),
     url(r'^test/(?P<id>[0-9]+)$', TestDetailView.as_view(), name='test-detail'),
-    url(r'^(Automation/)?[tT]ests.html$', TestsListView.as_view(), name='tests-list'),
-    url(r'^(Automation/)?[jJ]obs.html$', JobsListView.as_view(), name='jobs-list'),
+    url(r'^(Automation/)?[tT]ests.html$', cache_by_generation(TestsListView.as_view()), name='tests-list'),
+    url(r'^(Automation/)?[jJ]obs.html$', cache_by_generation(JobsListView.as_view()), name='jobs-list'),
     url(r'^(Automation/)?[dD]iffs.html$', JobsDiffView.as_view(), name='jobs-diff'),
     url(r'^(Automation/?)?$', HomePageView.as_view(), name='homepage'),
 